@@ -1,16 +1,61 @@
+import io
 import json
-from json import JSONDecodeError
+import uuid
 
 from cms.admin.pageadmin import PageAdmin
 from cms.models import Page, Placeholder, UserSettings
 from django.contrib import admin
-from django.http import HttpResponse
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
 from django.urls import path
 from django.utils.translation import ugettext_lazy as _
 
-from cmsplus.utils import generate_plugin_tree
-from cmsplus.utils import plus_add_plugin
+from cmsplus import serialization
+from cmsplus.app_settings import cmsplus_settings as cps
+from cmsplus.fields import FILER_SEARCH_FIELDS
+from cmsplus.utils import BulkPluginImporter, count_plugin_tree, generate_plugin_tree
+
+
+# the progress of an import by user and token, polled by the import form: with several server processes the cache
+# has to be shared (e.g. memcached, redis or the database cache, not the default local memory cache)
+CLIPBOARD_PROGRESS_KEY = 'cmsplus-clipboard-progress-%s-%s'
+
+
+class ClipboardLimitExceeded(Exception):
+    pass
+
+
+def import_clipboard_plugins(clipboard, file, progress_key, batch_size=100):
+    """
+    Parses the plugin trees of file incrementally and bulk imports them into the clipboard (see BulkPluginImporter)
+    in batches of about batch_size plugins (including the children). The plugins are counted while they are parsed,
+    more than CLIPBOARD_MAX_PLUGINS plugins raise ClipboardLimitExceeded, more than CLIPBOARD_MAX_UPLOAD_SIZE
+    decompressed bytes serialization.SizeLimitExceeded. The progress is stored in the cache under progress_key
+    after each batch.
+    """
+    importer = BulkPluginImporter(clipboard)
+    batch = []
+    batch_start = 0
+    plugin_count = 0
+
+    def count_plugin():
+        nonlocal plugin_count
+        plugin_count += 1
+        if plugin_count > cps.CLIPBOARD_MAX_PLUGINS:
+            raise ClipboardLimitExceeded()
+
+    for plugin_data in serialization.iter_trees(file, count_plugin, max_size=cps.CLIPBOARD_MAX_UPLOAD_SIZE):
+        batch.append(plugin_data)
+        if plugin_count - batch_start >= batch_size:
+            importer.import_plugins(batch)
+            batch = []
+            batch_start = plugin_count
+            cache.set(progress_key, {'plugins': importer.plugin_count, 'bytes': file.tell(), 'size': file.size})
+    importer.import_plugins(batch)
+    return importer.plugin_count
 
 
 class CustomPageAdmin(PageAdmin):
@@ -18,29 +63,49 @@ class CustomPageAdmin(PageAdmin):
         urls = [
             path('clipboard/import', self.admin_site.admin_view(self.clipboard_import), name='clipboard-import'),
             path('clipboard/export', self.admin_site.admin_view(self.clipboard_export), name='clipboard-export'),
+            path('clipboard/progress', self.admin_site.admin_view(self.clipboard_progress), name='clipboard-progress'),
+            path('filer/search', self.admin_site.admin_view(self.filer_search), name='filer-search'),
         ]
         return urls + super().get_urls()
 
     @staticmethod
     def clipboard_import(request):
-        context = {'errors': []}
+        context = {'errors': [], 'progress_token': uuid.uuid4().hex}
         if not request.user.is_staff:
             return HttpResponse(status=401)
 
         if request.POST:
             user_settings = UserSettings.objects.get(user=request.user)
             clipboard = Placeholder.objects.get(usersettings=user_settings, slot='clipboard')
-            # clear current clipboard
-            clipboard.get_plugins().delete()
 
-            data = []
-            try:
-                data = json.loads(request.POST.get('json_data'))
-            except JSONDecodeError:
-                context['errors'].append(_('Given json could not be converted'))
+            # json or msgpack, optionally compressed, see cmsplus.serialization
+            file = request.FILES.get('file')
+            if file is None:
+                file = io.BytesIO(request.POST.get('json_data', '').encode('utf-8'))
+                file.size = len(file.getvalue())
 
-            for plugin_data in data:
-                plus_add_plugin(clipboard, plugin_data)
+            if file.size > cps.CLIPBOARD_MAX_UPLOAD_SIZE:
+                context['errors'].append(_('The clipboard data exceeds the maximum size of %s bytes')
+                                         % cps.CLIPBOARD_MAX_UPLOAD_SIZE)
+            else:
+                progress_key = CLIPBOARD_PROGRESS_KEY % (request.user.pk, request.POST.get('progress_token', ''))
+                try:
+                    with transaction.atomic():
+                        # clear current clipboard
+                        clipboard.get_plugins().delete()
+                        import_clipboard_plugins(clipboard, file, progress_key)
+                except serialization.DecodeError:
+                    context['errors'].append(_('Given json could not be converted'))
+                except serialization.SizeLimitExceeded:
+                    context['errors'].append(_('The clipboard data exceeds the maximum size of %s bytes')
+                                             % cps.CLIPBOARD_MAX_UPLOAD_SIZE)
+                except ClipboardLimitExceeded:
+                    context['errors'].append(_('The clipboard data exceeds the maximum of %s plugins')
+                                             % cps.CLIPBOARD_MAX_PLUGINS)
+                except ImproperlyConfigured as e:
+                    context['errors'].append(str(e))
+                finally:
+                    cache.delete(progress_key)
 
             if len(context['errors']) < 1:
                 context['success'] = True
@@ -48,6 +113,16 @@ class CustomPageAdmin(PageAdmin):
 
         return render(request, 'cmsplus/admin/clipboard_import.html', context=context)
 
+    @staticmethod
+    def clipboard_progress(request):
+        """
+        Progress of a running clipboard import of the user: {'plugins': imported plugins, 'bytes': read bytes,
+        'size': bytes}.
+        """
+        if not request.user.is_staff:
+            return HttpResponse(status=401)
+        return JsonResponse(cache.get(CLIPBOARD_PROGRESS_KEY % (request.user.pk, request.GET.get('token', ''))) or {})
+
     @staticmethod
     def clipboard_export(request):
         if not request.user.is_staff:
@@ -56,10 +131,56 @@ class CustomPageAdmin(PageAdmin):
         context = {}
         placeholder = request.toolbar.clipboard
         plugin_tree = generate_plugin_tree(placeholder)
+        plugin_count = count_plugin_tree(plugin_tree)
+        if plugin_count > cps.CLIPBOARD_MAX_PLUGINS:
+            return HttpResponse(_('The clipboard exceeds the maximum of %s plugins') % cps.CLIPBOARD_MAX_PLUGINS,
+                                status=413)
+
+        # download, e.g. ?format=msgpack&compress=gzip
+        export_format = request.GET.get('format')
+        compress = request.GET.get('compress') or None
+        if export_format or compress:
+            export_format = export_format or 'json'
+            if export_format not in serialization.FORMATS or compress not in (None, ) + serialization.COMPRESSIONS:
+                return HttpResponse(status=400)
+            response = StreamingHttpResponse(
+                serialization.iter_dump(plugin_tree, format=export_format, compress=compress),
+                content_type='application/octet-stream')
+            file_name = 'clipboard.%s%s' % (export_format, {'gzip': '.gz', 'zstd': '.zst'}.get(compress, ''))
+            response['Content-Disposition'] = 'attachment; filename="%s"' % file_name
+            response['X-Plugin-Count'] = plugin_count
+            return response
 
         context['content'] = json.dumps(plugin_tree)
+        context['formats'] = serialization.FORMATS
+        context['compressions'] = serialization.COMPRESSIONS
         return render(request, 'cmsplus/admin/clipboard_export.html', context=context)
 
+    @staticmethod
+    def filer_search(request):
+        """
+        Paginated select2 search endpoint for the filer file and image search fields, e.g.:
+        ?type=image&term=products/teaser&page=2
+        """
+        if not request.user.is_staff:
+            return HttpResponse(status=401)
+
+        field_class = FILER_SEARCH_FIELDS.get(request.GET.get('type', 'file'))
+        if not field_class:
+            return HttpResponse(status=400)
+
+        try:
+            page = max(int(request.GET.get('page', 1)), 1)
+        except ValueError:
+            page = 1
+
+        results, more = field_class.search(request.GET.get('term', ''), page=page, page_size=cps.FILER_SEARCH_PAGE_SIZE,
+                                           user=request.user)
+        return JsonResponse({
+            'results': [{'id': str(pk), 'text': label} for pk, label in results],
+            'pagination': {'more': more},
+        })
+
 
 admin.site.unregister(Page)
 admin.site.register(Page, CustomPageAdmin)
@@ -1,4 +1,5 @@
 from django.conf import settings
+from django.core.signals import setting_changed
 
 from cmsplus.utils import JSONEncoder
 
@@ -38,6 +39,14 @@ DEFAULTS = {
 
     'JSON_ENCODER_CLASS': JSONEncoder,
 
+    # limits of the clipboard export and import views (uploaded bytes, plugins)
+    'CLIPBOARD_MAX_UPLOAD_SIZE': 50 * 1024 * 1024,
+    'CLIPBOARD_MAX_PLUGINS': 10000,
+
+    # copy PlusPlugin trees in bulk when publishing and copying plugins, see cmsplus.utils.install_bulk_plugin_copy.
+    # A fixed number of queries instead of several per plugin, but no plugin save signals are sent for the copies.
+    'BULK_PLUGIN_COPY': False,
+
     'MAP_LAYER_CHOICES': (
         ('', 'None'),
         ('stamen', 'Stamen'),
@@ -176,6 +185,9 @@ DEFAULTS = {
         ('1/6', '1/6 screen'),
     ),
 
+    # page size of the filer file search (PlusFilerFileSearchField, PlusFilerImageSearchField)
+    'FILER_SEARCH_PAGE_SIZE': 20,
+
     'BGIMG_FILTER_CHOICES': (
         ('', 'None'),
     ),
@@ -243,6 +255,12 @@ class CmsPlusSettings:
     def __init__(self, site_settings=None, defaults=None):
         self.site_settings = site_settings
         self.defaults = defaults
+        # incremented on reload, used to rebuild settings dependent structures (e.g. device form fields)
+        self.version = 0
+
+    def reload(self):
+        self.site_settings = getattr(settings, 'CMSPLUS', {})
+        self.version += 1
 
     def __getattr__(self, attr):
         ret = self.site_settings.get(attr, self.defaults.get(attr))
@@ -255,3 +273,11 @@ class CmsPlusSettings:
 
 
 cmsplus_settings = CmsPlusSettings(getattr(settings, 'CMSPLUS', {}), DEFAULTS)
+
+
+def reload_cmsplus_settings(*args, **kwargs):
+    if kwargs['setting'] == 'CMSPLUS':
+        cmsplus_settings.reload()
+
+
+setting_changed.connect(reload_cmsplus_settings)
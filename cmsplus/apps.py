@@ -4,12 +4,30 @@ import operator
 import cms.utils.placeholder
 from cms.utils.placeholder import get_placeholder_conf
 from django.apps import AppConfig
+from django.core.signals import setting_changed
 from django.utils.html import strip_tags
-from django.utils.translation import ugettext_lazy as _
+from django.utils.translation import get_language, ugettext_lazy as _
 
 logger = logging.getLogger(__name__)
 
 
+_footnotes = {}
+_toolbar_plugin_structs = {}
+
+
+def get_plugin_footnote(plugin):
+    """
+    Returns the plugins footnote_html without html tags. Footnotes are stripped once per plugin class, usually on
+    registration (see cmsplus.cms_plugins).
+    """
+    try:
+        return _footnotes[plugin]
+    except KeyError:
+        footnote_html = getattr(plugin, 'footnote_html', None)
+        footnote = _footnotes[plugin] = strip_tags(footnote_html) if footnote_html else footnote_html
+        return footnote
+
+
 def get_toolbar_plugin_struct(plugins, slot=None, page=None):
     """
        Return the list of plugins to render in the toolbar.
@@ -18,6 +36,9 @@ def get_toolbar_plugin_struct(plugins, slot=None, page=None):
        Names and modules can be defined on a per-placeholder basis using
        'plugin_modules' and 'plugin_labels' attributes in CMS_PLACEHOLDER_CONF
 
+       The structure is computed once per slot, template, plugin set and language (the order depends on the
+       translated module names).
+
        :param plugins: list of plugins
        :param slot: placeholder slot name
        :param page: the page
@@ -28,23 +49,36 @@ def get_toolbar_plugin_struct(plugins, slot=None, page=None):
     if page:
         template = page.template
 
-    modules = get_placeholder_conf("plugin_modules", slot, template, default={})
-    names = get_placeholder_conf("plugin_labels", slot, template, default={})
+    plugins = tuple(plugins)
+    key = (slot, template, tuple(plugin.value for plugin in plugins), get_language())
+    struct = _toolbar_plugin_structs.get(key)
 
-    main_list = []
+    if struct is None:
+        modules = get_placeholder_conf("plugin_modules", slot, template, default={})
+        names = get_placeholder_conf("plugin_labels", slot, template, default={})
+
+        main_list = []
+
+        # plugin.value points to the class name of the plugin
+        # It's added on registration. TIL.
+        for plugin in plugins:
+            main_list.append({'value': plugin.value,
+                              'name': names.get(plugin.value, plugin.name),
+                              'footnote': get_plugin_footnote(plugin),
+                              'module': modules.get(plugin.value, plugin.module)})
+        struct = _toolbar_plugin_structs[key] = tuple(sorted(main_list, key=operator.itemgetter("module")))
+
+    # callers get their own copy of the cached structure
+    return [dict(item) for item in struct]
 
-    # plugin.value points to the class name of the plugin
-    # It's added on registration. TIL.
-    for plugin in plugins:
-        footnote_html = getattr(plugin, 'footnote_html', None)
-        if footnote_html:
-            footnote_html = strip_tags(footnote_html)
 
-        main_list.append({'value': plugin.value,
-                          'name': names.get(plugin.value, plugin.name),
-                          'footnote': footnote_html,
-                          'module': modules.get(plugin.value, plugin.module)})
-    return sorted(main_list, key=operator.itemgetter("module"))
+def clear_toolbar_plugin_structs(*args, **kwargs):
+    if kwargs['setting'] in ('CMS_PLACEHOLDER_CONF', 'CMSPLUS'):
+        _toolbar_plugin_structs.clear()
+        _footnotes.clear()
+
+
+setting_changed.connect(clear_toolbar_plugin_structs)
 
 
 # monkey patch 'cms.utils.placeholder.get_toolbar_plugin_struct'
@@ -58,3 +92,8 @@ class DjangoCmsPlusConfig(AppConfig):
 
     def ready(self):
         super().ready()
+
+        # monkey patch the django cms plugin copy functions
+        from cmsplus.utils import install_bulk_plugin_copy
+        install_bulk_plugin_copy()
+        logger.debug('Monkey Patched: "cms.models.Placeholder.copy_plugins", "cms.utils.copy_plugins.copy_plugins_to"')
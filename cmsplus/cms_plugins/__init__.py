@@ -3,6 +3,7 @@ from importlib import import_module
 from cms.plugin_pool import plugin_pool
 
 from cmsplus.app_settings import cmsplus_settings as cps
+from cmsplus.apps import get_plugin_footnote
 
 # register all plugins configured cmsplus app_settings
 for plugin in cps.PLUGINS:
@@ -10,3 +11,4 @@ for plugin in cps.PLUGINS:
     mod = import_module(mod_name)
     cls = getattr(mod, cls_name)
     plugin_pool.register_plugin(cls)
+    get_plugin_footnote(cls)
@@ -9,8 +9,9 @@ from django.utils.translation import ugettext_lazy as _
 
 from cmsplus.app_settings import cmsplus_settings as cps
 from cmsplus.cms_plugins.generic.icon import IconField, get_icon_style_paths
-from cmsplus.fields import SizeField, PlusFilerImageSearchField
-from cmsplus.forms import (PlusPluginFormBase, LinkFormBase, get_style_form_fields, get_image_form_fields)
+from cmsplus.fields import SizeField, PlusFilerImageSearchField, PlusChoiceField
+from cmsplus.forms import (PlusPluginFormBase, LinkFormBase, get_style_form_fields, get_image_form_fields,
+                           compile_form)
 from cmsplus.models import PlusPlugin, LinkPluginMixin
 from cmsplus.plugin_base import (PlusPluginBase, StylePluginMixin, LinkPluginBase)
 
@@ -38,7 +39,7 @@ def get_choices(side, device, values):
         v, d = t
         # e.g. g-ml--1cw, or: g-mb-16 or: g-pb-16
         choices.append(('g-%s-%s' % (prefix, v), d))
-    return choices
+    return tuple(choices)
 
 
 def get_margin_choice_fields():
@@ -51,7 +52,7 @@ def get_margin_choice_fields():
             key = '%s_%s' % (side, dev)
             label = '%s %s' % (sides[side], cps.DEVICE_MAP[dev])
 
-            field = forms.ChoiceField(
+            field = PlusChoiceField(
                 label=label, required=False,
                 choices=get_choices(side, dev, choices[side]))
             yield key, field
@@ -65,7 +66,7 @@ def get_padding_choice_fields():
             key = '%s_%s' % (side, dev)
             label = '%s %s' % (sides[side], cps.DEVICE_MAP[dev])
 
-            field = forms.ChoiceField(
+            field = PlusChoiceField(
                 label=label, required=False,
                 choices=get_choices(side, dev, cps.PADDING_CHOICES))
             yield key, field
@@ -88,7 +89,7 @@ class MagicWrapperForm(PlusPluginFormBase):
         help_text=_('Select a background color.')
     )
 
-    # margin and padding fields are added in _extend_form_fields below
+    # margin and padding fields are added in get_extra_form_fields below
 
     element_id = forms.CharField(label=_('Element ID'), max_length=255, required=False)
 
@@ -117,23 +118,20 @@ class MagicWrapperForm(PlusPluginFormBase):
         return keys
 
     @classmethod
-    def _extend_form_fields(cls):
+    def get_extra_form_fields(cls):
         """ Because margin and padding form fields have to be added dynamically
         to reflect the devices: xs - xl, xxl, ... configured in app_settings
-        we get the MagicWrapperForm ready here.This method is called from
-        module level below.
+        we build them here, see compile_form.
         """
         # add margin fields mt_xs, mr_xs ... ml_xl
-        for field_name, field in get_margin_choice_fields():
-            cls.declared_fields[field_name] = field
+        yield from get_margin_choice_fields()
 
         # add padding fields pt_xs, pr_xs ... pl_xl
-        for field_name, field in get_padding_choice_fields():
-            cls.declared_fields[field_name] = field
+        yield from get_padding_choice_fields()
 
 
 # complete form fields with configured devices
-MagicWrapperForm._extend_form_fields()
+compile_form(MagicWrapperForm)
 
 
 WF_MARGIN_KEYS = MagicWrapperForm.get_margin_keys
@@ -346,7 +344,7 @@ class ColDefHelper:
 
         choices.extend(self.get_col_choices(tok, 'col', col_base=self.col_base))
         choices.append(('col%s%s-auto' % (self.col_base, tok), 'auto'))
-        return choices
+        return tuple(choices)
 
     def col_offset_choices(self, dev):
         """
@@ -358,7 +356,7 @@ class ColDefHelper:
         else:
             choices = [('', 'inherit'), ]
         choices.extend(self.get_attr_choices(tok, 'offset'))
-        return choices
+        return tuple(choices)
 
     def col_order_choices(self, dev):
         """
@@ -372,7 +370,7 @@ class ColDefHelper:
         choices.append(('order%s-first' % tok, 'first'))
         choices.extend(self.get_attr_choices(tok, 'order'))
         choices.append(('order%s-last' % tok, 'last'))
-        return choices
+        return tuple(choices)
 
     def col_display_choices(self, dev):
         """
@@ -387,7 +385,7 @@ class ColDefHelper:
 
         for v in display_values:
             choices.append(('d%s-%s' % (tok, v), '%s' % v),)
-        return choices
+        return tuple(choices)
 
     def get_column_form_fields(self, attrs=None, initials=None, choices=None):
         attrs = [] if not attrs else attrs
@@ -405,12 +403,12 @@ class ColDefHelper:
                 label = '%s %s' % (cps.DEVICE_MAP[dev], attr)
 
                 if attr == 'width' and dev == 'xs':
-                    field = forms.ChoiceField(
+                    field = PlusChoiceField(
                         label=label, required=False,
                         choices=attr_choices,
                         initial=initials.get(attr, {}).get(dev, 'col'))
                 else:
-                    field = forms.ChoiceField(
+                    field = PlusChoiceField(
                         label=label, required=False,
                         choices=attr_choices,
                         initial=initials.get(attr, {}).get(dev, ''))
@@ -430,8 +428,9 @@ class BootstrapColumnForm(PlusPluginFormBase):
     STYLE_CHOICES = 'MOD_COL_STYLES'
     extra_style, extra_classes, label, extra_css = get_style_form_fields(STYLE_CHOICES)
 
-    # offset and width fields are dynamically added with _extend_form_fields
+    # offset and width fields are dynamically added with get_extra_form_fields
     # method below
+    col_helper = ColDefHelper(col_range=13, col_base='')  # default 12 divided form
 
     @staticmethod
     def get_column_keys(for_attrs=None):
@@ -444,19 +443,25 @@ class BootstrapColumnForm(PlusPluginFormBase):
 
     # noinspection GrazieInspection
     @classmethod
-    def extend_form_fields(cls, col_helper):
+    def get_extra_form_fields(cls):
         """ Because column size form fields have to be added dynamically
         to reflect the devices: xs - xl, xxl, ... configured in app_settings
-        we get the form ready here. This method is called from
-        module level below.
+        we build them here with the forms col_helper, see compile_form.
         """
         # add column size fields col_offset_xs ..., col_width_xs ...,
         # col_order_xs.., col_display_xs .. col_display_xl
-        for field_name, field in col_helper.get_column_form_fields():
-            cls.declared_fields[field_name] = field
+        return cls.col_helper.get_column_form_fields()
+
+    @classmethod
+    def extend_form_fields(cls, col_helper):
+        """
+        Rebuild the column size fields with the given ColDefHelper.
+        """
+        cls.col_helper = col_helper
+        compile_form(cls, force=True)
 
 
-BootstrapColumnForm.extend_form_fields(ColDefHelper(col_range=13, col_base=''))  # default 12 divided form
+compile_form(BootstrapColumnForm)
 
 MCF_COLUMN_KEYS = BootstrapColumnForm.get_column_keys
 
@@ -514,9 +519,10 @@ class BootstrapCol10Form(BootstrapColumnForm):
     """
     10 divided column form.
     """
+    col_helper = ColDefHelper(col_range=11, col_base='10')
 
 
-BootstrapCol10Form.extend_form_fields(ColDefHelper(col_range=11, col_base='10'))
+compile_form(BootstrapCol10Form)
 
 
 class BootstrapCol10Plugin(BootstrapColPlugin):
@@ -552,15 +558,15 @@ def get_img_dev_width_fields(initials=None):
         label = '%s Width' % cps.DEVICE_MAP[dev].title()
 
         if dev == 'xs':
-            field = forms.ChoiceField(
+            field = PlusChoiceField(
                 label=label,
                 choices=cps.IMG_DEV_WIDTH_CHOICES,
                 initial=initials.get('xs', '1/2'))
         else:
-            field = forms.ChoiceField(
+            field = PlusChoiceField(
                 label=label,
                 required=False,
-                choices=[('', 'inherit'), ] + list(cps.IMG_DEV_WIDTH_CHOICES),
+                choices=(('', 'inherit'), ) + tuple(cps.IMG_DEV_WIDTH_CHOICES),
                 initial=initials.get(dev, ''))
 
         field_name = 'img_dev_width_%s' % dev
@@ -620,7 +626,7 @@ class BootstrapImageForm(LinkFormBase):
         help_text=_("How to align the image (this choice only applies if the image is fixed size (none repsonsive)."),
     )
 
-    # fixed width and height fields are added with _extend_form_fields below
+    # fixed width and height fields are added with get_extra_form_fields below
 
     RESIZE_OPTIONS = [
         ('crop', _("Crop image")),
@@ -635,19 +641,16 @@ class BootstrapImageForm(LinkFormBase):
         help_text=_("Options to use when calculating the cached size device specific version of the image."),
     )
 
-    # img_dev_width fields are added with _extend_form_fields below
+    # img_dev_width fields are added with get_extra_form_fields below
 
     @classmethod
-    def extend_form_fields(cls):
-        for field_name, field in get_fixed_dim_fields('width'):
-            cls.declared_fields[field_name] = field
-        for field_name, field in get_fixed_dim_fields('height'):
-            cls.declared_fields[field_name] = field
-        for field_name, field in get_img_dev_width_fields():
-            cls.declared_fields[field_name] = field
+    def get_extra_form_fields(cls):
+        yield from get_fixed_dim_fields('width')
+        yield from get_fixed_dim_fields('height')
+        yield from get_img_dev_width_fields()
 
 
-BootstrapImageForm.extend_form_fields()
+compile_form(BootstrapImageForm)
 
 
 class BootstrapImagePluginModel(PlusPlugin, LinkPluginMixin):
@@ -1016,12 +1019,11 @@ class BackgroundImageForm(PlusPluginFormBase):
     extra_style, extra_classes, label, extra_css = get_style_form_fields(STYLE_CHOICES)
 
     @classmethod
-    def extend_form_fields(cls):
-        for field_name, field in get_img_dev_width_fields():
-            cls.declared_fields[field_name] = field
+    def get_extra_form_fields(cls):
+        return get_img_dev_width_fields()
 
 
-BackgroundImageForm.extend_form_fields()
+compile_form(BackgroundImageForm)
 
 
 class BackgroundImagePropertiesMixin():
@@ -8,9 +8,9 @@ from django.utils.safestring import mark_safe
 from django.utils.translation import ugettext_lazy as _
 
 from cmsplus.app_settings import cmsplus_settings as cps
-from cmsplus.fields import SizeField, PlusFilerFileSearchField
+from cmsplus.fields import SizeField, PlusFilerFileSearchField, PlusChoiceField
 from cmsplus.forms import (PlusPluginFormBase, LinkFormBase,
-                           get_style_form_fields)
+                           get_style_form_fields, compile_form)
 from cmsplus.models import (PlusPlugin, LinkPluginMixin, )
 from cmsplus.plugin_base import (StylePluginMixin, PlusPluginBase, LinkPluginBase)
 
@@ -91,24 +91,23 @@ class MultiColTextForm(PlusPluginFormBase):
     @staticmethod
     def _get_col_choice_field(dev):
         if dev == 'xs':
-            choices = [('', '1 (default)'), ]
+            choices = (('', '1 (default)'), )
         else:
-            choices = [('', 'inherit'), ]
-        choices.extend(list(cps.TX_COL_CHOICES))
+            choices = (('', 'inherit'), )
+        choices += tuple(cps.TX_COL_CHOICES)
 
         field_name = 'col_%s' % dev
-        field = forms.ChoiceField(
+        field = PlusChoiceField(
             label=u'%s No. of Cols' % cps.DEVICE_MAP[dev], required=False, choices=choices, initial='')
         return field_name, field
 
     @classmethod
-    def extend_col_fields(cls):
+    def get_extra_form_fields(cls):
         for dev in cps.DEVICES:
-            field_name, field = cls._get_col_choice_field(dev)
-            cls.declared_fields[field_name] = field
+            yield cls._get_col_choice_field(dev)
 
 
-MultiColTextForm.extend_col_fields()
+compile_form(MultiColTextForm)
 
 
 class MultiColumnTextPlugin(StylePluginMixin, PlusPluginBase):
@@ -1,5 +1,6 @@
 import json
 import os
+import threading
 
 from django import forms
 from django.contrib.staticfiles import finders
@@ -15,42 +16,67 @@ from cmsplus.models import PlusPlugin, LinkPluginMixin
 from cmsplus.plugin_base import LinkPluginBase, StylePluginMixin
 
 
-class IconFieldWidget(forms.Widget):
-    template_name = "cmsplus/forms/widgets/icon.html"
-    icons = []
+_icons_cache = {}
+_icons_lock = threading.Lock()
 
-    def __init__(self, attrs=None):
-        super().__init__(attrs)
+NO_ICON = {
+    'name': _('No icon'),
+    'label': _('No icon'),
+    'font_class_name': 'cmsplus-icon-none'
+}
 
-        # add fontawesome
-        if cps.ICONS_FONTAWESOME and cps.ICONS_FONTAWESOME_SHOW:
-            self.icons += self.get_fontawesome_icons
 
-        # add bootstrap
-        if cps.ICONS_BOOTSTRAP and cps.ICONS_BOOTSTRAP_SHOW:
-            self.icons += self.get_bootstrap_icons
+class IconFieldWidget(forms.Widget):
+    template_name = "cmsplus/forms/widgets/icon.html"
+
+    @property
+    def icons(self):
+        return self.get_icons()
 
-        # add icons
-        for font in getattr(cps, 'ICONS_FONTELLO', []):
-            self.icons += self.get_fontello(font)
+    @classmethod
+    def get_icons(cls):
+        """
+        Returns a tuple of all configured icons. The icon meta files are read once per cmsplus settings version,
+        the result is shared between all widgets and threads and must not be modified.
+        """
+        icons = _icons_cache.get(cps.version)
+        if icons is not None:
+            return icons
+
+        with _icons_lock:
+            icons = _icons_cache.get(cps.version)
+            if icons is None:
+                icons = []
+                # add fontawesome
+                if cps.ICONS_FONTAWESOME and cps.ICONS_FONTAWESOME_SHOW:
+                    icons += cls.load_fontawesome_icons()
+
+                # add bootstrap
+                if cps.ICONS_BOOTSTRAP and cps.ICONS_BOOTSTRAP_SHOW:
+                    icons += cls.load_bootstrap_icons()
+
+                # add icons
+                for font in getattr(cps, 'ICONS_FONTELLO', []):
+                    icons += cls.get_fontello(font)
+
+                icons = tuple(icons)
+                _icons_cache.clear()
+                _icons_cache[cps.version] = icons
+        return icons
 
     def render(self, name, value, add_to_class=None, attrs=None, renderer=None):
         if renderer is None:
             renderer = get_default_renderer()
+        attrs = attrs or {}
 
-        icons = IconFieldWidget.icons
+        icons = self.get_icons()
 
         # add "no-icon" if not required
         if not attrs.get('required'):
-            if not any(f['font_class_name'] == 'cmsplus-icon-none' for f in icons):
-                icons.insert(0, {
-                    'name': _('No icon'),
-                    'label': _('No icon'),
-                    'font_class_name': 'cmsplus-icon-none'
-                })
+            icons = (NO_ICON, ) + icons
 
         context = self.get_context(name, value, attrs)
-        context['widget']['icons'] = IconFieldWidget.icons
+        context['widget']['icons'] = icons
         context['widget']['value'] = value
         context['widget']['name'] = name
         context['widget']['attrs'] = attrs
@@ -59,6 +85,14 @@ class IconFieldWidget(forms.Widget):
 
     @cached_property
     def get_bootstrap_icons(self):
+        return self.load_bootstrap_icons()
+
+    @cached_property
+    def get_fontawesome_icons(self):
+        return self.load_fontawesome_icons()
+
+    @staticmethod
+    def load_bootstrap_icons():
         icons = []
         path = finders.find(cps.ICONS_BOOTSTRAP['meta'])
         if not os.path.exists(path):
@@ -80,8 +114,8 @@ class IconFieldWidget(forms.Widget):
             })
         return icons
 
-    @cached_property
-    def get_fontawesome_icons(self):
+    @staticmethod
+    def load_fontawesome_icons():
         icons = []
         # list of dicts:
         # { 'name': '',
@@ -10,7 +10,7 @@ from cmsplus.plugin_base import LinkPluginBase, StylePluginMixin
 
 
 def get_visible_slides_fields():
-    n_choices = [(n, '%d slides' % n) for n in range(1, 16)]
+    n_choices = tuple((n, '%d slides' % n) for n in range(1, 16))
     fields = []
     for dev in reversed(cmsplus_settings.DEVICES):
         if dev == 'xl':
@@ -20,7 +20,7 @@ def get_visible_slides_fields():
         else:
             initial = '1' if dev == 'sm' else ''
             required = False
-            choices = [('', 'inherit'), ] + n_choices
+            choices = (('', 'inherit'), ) + n_choices
         label = _('Num %s' % dev)
 
         field = forms.ChoiceField(label=label, required=required, choices=choices, initial=initial)
@@ -137,15 +137,14 @@ class SliderPlugin(StylePluginMixin, LinkPluginBase):
         return context
 
     @classmethod
-    def sanitize_model(cls, obj):
+    def sanitize_data(cls, data):
         breakpoints = {}
         for dev in reversed(cmsplus_settings.DEVICES):
             key = 'n_slides_%s' % dev
             width = cmsplus_settings.DEVICE_MAX_WIDTH_MAP[dev]
-            if obj.glossary.get(key):
-                breakpoints[width] = {'perView': int(obj.glossary[key])}
-        obj.data['breakpoints'] = breakpoints
-        return True
+            if data.get(key):
+                breakpoints[width] = {'perView': int(data[key])}
+        data['breakpoints'] = breakpoints
 
 
 class SlideForm(LinkFormBase):
@@ -6,22 +6,20 @@ from abc import abstractmethod, ABC
 from cms.models.pagemodel import Page
 from cms.utils import get_current_site
 from django import forms
-from django.contrib.admin.sites import site as admin_site
 from django.contrib.admin.widgets import AdminSplitDateTime
 from django.core.exceptions import ValidationError, ObjectDoesNotExist
 from django.core.validators import ProhibitNullCharactersValidator, RegexValidator
-from django.db.models.fields.related import ManyToOneRel
+from django.db.models import Q
 from django.forms.fields import Field
 from django.utils.datetime_safe import datetime
 from django.utils.deconstruct import deconstructible
 from django.utils.translation import ugettext_lazy as _, ugettext
-from filer.fields.file import AdminFileWidget, FilerFileField
-from filer.fields.image import FilerImageField
 from filer.models.filemodels import File as FilerFileModel
+from filer.models.foldermodels import FolderPermission
 from filer.models.imagemodels import Image as FilerImageModel
 from six import string_types, u
 
-from cmsplus.widgets import KeyValueWidget
+from cmsplus.widgets import KeyValueWidget, FilerSearchWidget
 
 logger = logging.getLogger(__name__)
 
@@ -50,10 +48,18 @@ class PlusModelChoiceField(forms.ModelChoiceField, BaseFieldMixIn):
     def serialize_field(self, obj: object):
         return getattr(obj, "pk", None)
 
-    def deserialize_field(self, value):
+    def deserialize_field(self, value, objects=None):
+        """
+        objects may be a {pk: object} dict of already fetched objects, see PlusPluginBase.prefetch_glossaries.
+        """
         if value is None:
             return None
         try:
+            if objects is not None:
+                try:
+                    return objects[self.queryset.model._meta.pk.to_python(value)]
+                except KeyError:
+                    raise self.queryset.model.DoesNotExist
             return self.queryset.get(pk=value)
         except ObjectDoesNotExist as e:
             raise ValidationError('PlusModelChoiceField Deserialization Error: Could not find %s object with pk %s' %
@@ -79,6 +85,26 @@ class PlusModelChoiceField(forms.ModelChoiceField, BaseFieldMixIn):
         return value
 
 
+class PlusChoiceField(forms.ChoiceField):
+    """
+    ChoiceField with immutable choices (a tuple), which are shared between form instances instead of being
+    deep-copied on every form instantiation. Use it for large, settings dependent choice lists, e.g. device fields.
+    """
+
+    def __deepcopy__(self, memo):
+        result = super(forms.ChoiceField, self).__deepcopy__(memo)
+        result._choices = self._choices
+        return result
+
+    def _get_choices(self):
+        return self._choices
+
+    def _set_choices(self, value):
+        self._choices = self.widget.choices = tuple(value)
+
+    choices = property(_get_choices, _set_choices)
+
+
 class PageChoiceIterator(forms.models.ModelChoiceIterator):
     """ Sort pages by absolute url. """
 
@@ -110,29 +136,99 @@ class PageSearchField(PlusModelChoiceField):
         return obj.get_absolute_url()
 
 
-class PlusFilerFileSearchField(PlusModelChoiceField):
+def search_filer_files(queryset, term):
+    """
+    Filters a filer File or Image queryset by the given search term. The last part of the term is matched against
+    the original filename, preceding parts (separated by '/') against the folder path, e.g.:
+    'products/2020/teaser' finds files named like 'teaser' in a folder like '2020' with a parent folder like
+    'products'.
+    """
+    parts = [p.strip() for p in (term or '').split('/')]
+    filename = parts.pop()
+    if filename:
+        queryset = queryset.filter(original_filename__icontains=filename)
 
-    def __init__(
-            self,
-            queryset=FilerFileModel.objects.all(),
-            widget=AdminFileWidget(
-                ManyToOneRel(FilerFileField, FilerFileModel, 'id'), admin_site),
-            *args, **kwargs
-    ):
-        super().__init__(queryset=queryset, widget=widget, *args, **kwargs)
+    lookup = 'folder__name__icontains'
+    for folder_name in reversed(parts):
+        if folder_name:
+            queryset = queryset.filter(**{lookup: folder_name})
+        lookup = 'folder__parent__' + lookup[len('folder__'):]
+    return queryset
 
 
-class PlusFilerImageSearchField(PlusModelChoiceField):
+def filter_readable_files(queryset, user):
+    """
+    Restricts the filer files queryset to the files the user may read, the same rules as filer's
+    File.has_read_permission: the user owns the file or its folder or has read permission on the folder.
+    """
+    if not user.is_authenticated:
+        return queryset.none()
+    folder_ids = FolderPermission.objects.get_read_id_list(user)
+    if folder_ids == 'All':
+        return queryset
+    return queryset.filter(Q(folder_id__in=folder_ids) | Q(owner=user) | Q(folder__owner=user))
 
-    def __init__(
-            self,
-            queryset=FilerImageModel.objects.all(),
-            widget=AdminFileWidget(
-                ManyToOneRel(FilerImageField, FilerImageModel, 'id'), admin_site),
-            *args, **kwargs
-    ):
+
+class PlusFilerSearchFieldMixin:
+    """
+    Model choice field for filer files, which uses the paginated filer search endpoint instead of a choice list.
+    Querysets and widgets are created on field init, only the selected pk is fetched during validation.
+    """
+    filer_model = None
+    search_type = None
+
+    def __init__(self, queryset=None, widget=None, *args, **kwargs):
+        if queryset is None:
+            queryset = self.filer_model.objects.all()
+        if widget is None:
+            widget = FilerSearchWidget(search_type=self.search_type)
         super().__init__(queryset=queryset, widget=widget, *args, **kwargs)
 
+    @staticmethod
+    def get_file_label(obj):
+        """
+        Display value is the folder name and the files label, e.g.: products/teaser.jpg
+        """
+        if obj.folder_id:
+            return '%s/%s' % (obj.folder.name, obj.label)
+        return obj.label
+
+    def label_from_instance(self, obj):
+        return self.get_file_label(obj)
+
+    @classmethod
+    def search(cls, term, page=1, page_size=20, user=None):
+        """
+        Returns a list of (pk, label) tuples for the given search term and page and whether there are more pages.
+        Only page_size + 1 rows are fetched, the result set is never counted. With user only the files readable by
+        the user are found (see filter_readable_files).
+        """
+        queryset = cls.filer_model.objects.non_polymorphic().select_related('folder')
+        if user is not None:
+            queryset = filter_readable_files(queryset, user)
+        queryset = search_filer_files(queryset, term).order_by('original_filename', 'pk')
+
+        offset = (page - 1) * page_size
+        objs = list(queryset[offset:offset + page_size + 1])
+        more = len(objs) > page_size
+        return [(obj.pk, cls.get_file_label(obj)) for obj in objs[:page_size]], more
+
+
+class PlusFilerFileSearchField(PlusFilerSearchFieldMixin, PlusModelChoiceField):
+    filer_model = FilerFileModel
+    search_type = 'file'
+
+
+class PlusFilerImageSearchField(PlusFilerSearchFieldMixin, PlusModelChoiceField):
+    filer_model = FilerImageModel
+    search_type = 'image'
+
+
+FILER_SEARCH_FIELDS = {
+    PlusFilerFileSearchField.search_type: PlusFilerFileSearchField,
+    PlusFilerImageSearchField.search_type: PlusFilerImageSearchField,
+}
+
 
 # SizeField
 # ---------
@@ -1,4 +1,5 @@
 import logging
+import threading
 from collections import OrderedDict
 
 from django import forms
@@ -36,6 +37,14 @@ class PlusPluginFormBase(forms.ModelForm):
             kwargs['initial'] = initial
         super(PlusPluginFormBase, self).__init__(*args, **kwargs)
 
+    @classmethod
+    def get_extra_form_fields(cls):
+        """
+        Hook to return (field_name, field) tuples of form fields which depend on the cmsplus settings, e.g. one
+        field per configured device. They are built and added to the declared fields by compile_form.
+        """
+        return ()
+
     def save(self, commit=True):
         """
         Put serialized data to glossary (_json) field, then save.
@@ -63,9 +72,10 @@ class PlusPluginFormBase(forms.ModelForm):
                 parsed_data[key] = value
         return parsed_data
 
-    def deserialize(self):
+    def deserialize(self, related=None):
         """
         Deserialize data from Json field into dict. Opposite of serialize function (see above)
+        :param related: optional {field_name: {pk: object}} of already fetched objects for model choice fields
         :return: Data
         :rtype: dict:
         """
@@ -79,7 +89,10 @@ class PlusPluginFormBase(forms.ModelForm):
                 deserialize_field = getattr(field, "deserialize_field")
                 if callable(deserialize_field):
                     try:
-                        parsed_dict[field_name] = deserialize_field(value)
+                        if related and field_name in related:
+                            parsed_dict[field_name] = deserialize_field(value, objects=related[field_name])
+                        else:
+                            parsed_dict[field_name] = deserialize_field(value)
                     except ValidationError as e:
                         self._update_errors(e)
             else:
@@ -88,6 +101,38 @@ class PlusPluginFormBase(forms.ModelForm):
         return parsed_dict
 
 
+_compiled_forms = {}
+_compile_lock = threading.Lock()
+
+
+def compile_form(form_class, force=False):
+    """
+    Builds the settings dependent fields of form_class (see PlusPluginFormBase.get_extra_form_fields) once per
+    cmsplus settings version and adds them to the declared fields of the form class. The declared fields are
+    replaced as a whole, so concurrent form instantiations always see a complete field set. Forms without
+    get_extra_form_fields are left unchanged.
+    Returns the form_class.
+    """
+    get_extra_form_fields = getattr(form_class, 'get_extra_form_fields', None)
+    if get_extra_form_fields is None:
+        return form_class
+
+    version = cmsplus_settings.version
+    if not force and _compiled_forms.get(form_class, (None, ))[0] == version:
+        return form_class
+
+    with _compile_lock:
+        compiled_version, field_names = _compiled_forms.get(form_class, (None, ()))
+        if force or compiled_version != version:
+            declared_fields = OrderedDict(
+                (k, v) for k, v in form_class.declared_fields.items() if k not in field_names)
+            extra_fields = OrderedDict(get_extra_form_fields())
+            declared_fields.update(extra_fields)
+            form_class.declared_fields = declared_fields
+            _compiled_forms[form_class] = (version, tuple(extra_fields))
+    return form_class
+
+
 # StylePluginMixin form fields
 # ----------------------------
 #
@@ -148,12 +193,12 @@ class LinkFormBase(PlusPluginFormBase):
     """
     provides fields and methods which are needed to handle different link types.
     """
-    LINK_TYPE_CHOICES = [
+    LINK_TYPE_CHOICES = (
         ('cmspage', _("CMS Page")),
         ('download', _("Download File")),
         ('exturl', _("External URL")),
         ('email', _("Mail To")),
-    ]
+    )
 
     link_type = forms.ChoiceField(
         label=_("Link"),
@@ -197,12 +242,12 @@ class LinkFormBase(PlusPluginFormBase):
     )
 
     link_target = forms.ChoiceField(
-        choices=[
+        choices=(
             ('', _("Same Window")),
             ('_blank', _("New Window")),
             ('_parent', _("Parent Window")),
             ('_top', _("Topmost Frame")),
-        ],
+        ),
         label=_("Link Target"),
         required=False,
         help_text=_("Open Link in other target."),
@@ -215,14 +260,21 @@ class LinkFormBase(PlusPluginFormBase):
     )
 
     def __init__(self, *args, **kwargs):
-        link_type_choices = []
-        if not getattr(self, 'require_link', True):
-            link_type_choices.append(('', _("No Link")))
-            self.declared_fields['link_type'].required = False
-        link_type_choices.extend(self.LINK_TYPE_CHOICES)
-        self.declared_fields['link_type'].choices = link_type_choices
-        self.declared_fields['link_type'].initial = link_type_choices[0][0]
         super(LinkFormBase, self).__init__(*args, **kwargs)
+        # only the form instance's own copy of the link_type field is adjusted, the declared (class) field is
+        # shared between all link forms
+        link_type = self.fields.get('link_type')
+        if link_type:
+            link_type_choices = self.get_link_type_choices()
+            link_type.required = getattr(self, 'require_link', True)
+            link_type.choices = link_type_choices
+            link_type.initial = link_type_choices[0][0]
+
+    @classmethod
+    def get_link_type_choices(cls):
+        if getattr(cls, 'require_link', True):
+            return tuple(cls.LINK_TYPE_CHOICES)
+        return (('', _("No Link")), ) + tuple(cls.LINK_TYPE_CHOICES)
 
     def clean(self):
         cleaned_data = super(LinkFormBase, self).clean()
@@ -0,0 +1,272 @@
+import json
+import logging
+import platform
+import statistics
+import time
+from contextlib import contextmanager
+
+import cms
+import django
+from cms.models import Page, Placeholder
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+import cmsplus
+from cmsplus.cms_plugins.bootstrap import BootstrapImagePluginModel
+from cmsplus.forms import compile_form
+from cmsplus.management.commands.generate_site import SiteGenerator, create_images
+from cmsplus.models import PlusPlugin, LinkPluginMixin
+from cmsplus.utils import PageImporter, PageUtils, downcast_plugin_instances, generate_plugin_tree, \
+    generate_structure
+
+logger = logging.getLogger('django')
+
+DEFAULT_MIX = {
+    'BootstrapContainerPlugin': 2,
+    'BootstrapImagePlugin': 3,
+    'BootstrapButtonPlugin': 2,
+    'HeadingPlugin': 3,
+    'IconPlugin': 1,
+}
+
+
+class Rollback(Exception):
+    pass
+
+
+@contextmanager
+def rollback():
+    """
+    Runs the block in a transaction, which is rolled back afterwards.
+    """
+    try:
+        with transaction.atomic():
+            yield
+            raise Rollback
+    except Rollback:
+        pass
+
+
+def measure(func, repeat=5, setup=None, teardown=None):
+    """
+    Returns the timings (in seconds) of repeat calls of func, setup and teardown are not timed.
+    """
+    timings = []
+    for i in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+        if teardown:
+            teardown()
+    return timings
+
+
+def get_stats(timings, count):
+    return {
+        'count': count,
+        'repeat': len(timings),
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.mean(timings),
+        'stdev': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        'per_item': min(timings) / count if count else None,
+    }
+
+
+class SiteBenchmark:
+    """
+    Benchmarks of the glossary, render, admin form and import/export hot paths on a generated (seeded) site, images
+    are the filer images of the image plugins (see create_images). Each benchmark returns (count, timings), see
+    measure.
+    """
+    names = ('glossary', 'css_classes', 'image_render', 'plugin_tree', 'page_export', 'page_import', 'link_form')
+
+    def __init__(self, pages=10, plugins=20, seed=0, images=(), repeat=5, mix=None):
+        from faker import Faker
+
+        self.repeat = repeat
+        generator = SiteGenerator(Faker(), seed=seed, mix=mix or DEFAULT_MIX, images=images)
+        self.pages_data = generator.generate(pages, plugins)
+        importer = PageImporter()
+        importer.import_pages(self.pages_data)
+        self.page_count = importer.page_count
+        self.plugin_count = importer.plugin_count
+
+        self.pages = list(Page.objects.filter(pk__in=importer.context.imported_pages).select_related('node'))
+        self.placeholders = list(Placeholder.objects.filter(page__in=self.pages))
+        plugins = PlusPlugin.objects.filter(placeholder__in=self.placeholders).select_related('placeholder')
+        self.instances = list(downcast_plugin_instances(plugins).values())
+        placeholders = {placeholder.pk: placeholder for placeholder in self.placeholders}
+        for instance in self.instances:
+            instance.placeholder = placeholders[instance.placeholder_id]
+
+    def run(self, names=None):
+        results = {}
+        for name in names or self.names:
+            count, timings = getattr(self, f'bench_{name}')()
+            results[name] = get_stats(timings, count)
+            logger.debug(f'{name}: {results[name]}')
+        return results
+
+    def reset_glossaries(self):
+        for instance in self.instances:
+            instance._glossary = None
+
+    def bench_glossary(self):
+        def func():
+            for instance in self.instances:
+                instance.glossary
+
+        return len(self.instances), measure(func, self.repeat, setup=self.reset_glossaries)
+
+    def bench_css_classes(self):
+        def func():
+            for instance in self.instances:
+                instance.css_classes
+                instance.extra_css
+
+        # the glossaries are decoded before, see bench_glossary
+        for instance in self.instances:
+            instance.glossary
+        return len(self.instances), measure(func, self.repeat)
+
+    def bench_image_render(self):
+        images = [instance for instance in self.instances if isinstance(instance, BootstrapImagePluginModel)]
+
+        def func():
+            for instance in images:
+                instance.get_plugin_class_instance().render({}, instance, instance.placeholder)
+
+        return len(images), measure(func, self.repeat, setup=self.reset_glossaries)
+
+    def bench_plugin_tree(self):
+        def func():
+            for placeholder in self.placeholders:
+                generate_plugin_tree(placeholder)
+
+        return self.plugin_count, measure(func, self.repeat)
+
+    def bench_page_export(self):
+        roots = [page for page in self.pages if page.node.parent_id is None]
+
+        def func():
+            for page in roots:
+                PageUtils(page)
+
+        return self.page_count, measure(func, self.repeat)
+
+    def bench_page_import(self):
+        # the imported pages are rolled back after each run
+        sid = None
+
+        def setup():
+            nonlocal sid
+            sid = transaction.savepoint()
+
+        def teardown():
+            transaction.savepoint_rollback(sid)
+
+        return self.page_count, measure(lambda: generate_structure(self.pages_data), self.repeat, setup, teardown)
+
+    def bench_link_form(self):
+        links = [instance for instance in self.instances if isinstance(instance, LinkPluginMixin)]
+
+        def func():
+            for instance in links:
+                compile_form(instance.plugin_class.form)(instance=instance)
+
+        return len(links), measure(func, self.repeat, setup=self.reset_glossaries)
+
+
+def compare_results(results, baseline, threshold=1.2):
+    """
+    Returns the (name, ratio) tuples of the benchmarks, whose min timing per item is more than threshold times
+    slower than in the baseline results.
+    """
+    regressions = []
+    for name, stats in results.items():
+        base = baseline.get(name)
+        if not base or not base.get('per_item') or not stats.get('per_item'):
+            continue
+        ratio = stats['per_item'] / base['per_item']
+        if ratio > threshold:
+            regressions.append((name, ratio))
+    return regressions
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the glossary, render, admin and import/export hot paths on a generated site, the data is ' \
+           'rolled back afterwards'
+
+    def add_arguments(self, parser):
+        parser.add_argument("-o", "--output", help="Output JSON file path (default: stdout)")
+        parser.add_argument("--pages", type=int, default=10, help="Number of generated pages")
+        parser.add_argument("--plugins", type=int, default=20, help="Number of plugins per placeholder")
+        parser.add_argument("--images", type=int, default=3, help="Number of generated filer images")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed of the generated site")
+        parser.add_argument("--repeat", type=int, default=5, help="Number of timed runs per benchmark")
+        parser.add_argument("--only", nargs='+', choices=SiteBenchmark.names, help="Run only the given benchmarks")
+        parser.add_argument("--compare", help="Compare with the results of a previous run (JSON file)")
+        parser.add_argument("--threshold", type=float, default=1.2,
+                            help="Compare: Fail if a benchmark is slower than the given factor")
+
+    def handle(self, *args, **options):
+        out = self.stdout if options.get('output') else self.stderr
+        baseline = None
+        if options.get('compare'):
+            try:
+                with open(options['compare'], 'r') as file:
+                    baseline = json.load(file)['results']
+            except (OSError, ValueError, KeyError) as e:
+                raise CommandError(f'Invalid baseline "{options["compare"]}": {e}')
+
+        out.write('\n-- Running benchmarks --')
+        images = []
+        try:
+            with rollback():
+                images = create_images(options['images'], seed=options['seed'])
+                benchmark = SiteBenchmark(pages=options['pages'], plugins=options['plugins'], seed=options['seed'],
+                                          images=images, repeat=options['repeat'])
+                results = benchmark.run(options.get('only'))
+        except ValueError as e:
+            # e.g. no filer images for the image plugins (--images 0)
+            raise CommandError(str(e))
+        finally:
+            # the database changes are rolled back, the generated image files are deleted from the media storage
+            for image in images:
+                image.file.delete(save=False)
+
+        data = {
+            'timestamp': timezone.now().isoformat(),
+            'versions': {
+                'cmsplus': cmsplus.__version__,
+                'django': django.get_version(),
+                'cms': cms.__version__,
+                'python': platform.python_version(),
+            },
+            'options': {key: options[key] for key in ('pages', 'plugins', 'images', 'seed', 'repeat')},
+            'pages': benchmark.page_count,
+            'plugins': benchmark.plugin_count,
+            'results': results,
+        }
+        if options.get('output'):
+            with open(options['output'], 'w') as file:
+                json.dump(data, file, indent=2)
+            out.write(self.style.SUCCESS(f'Results written to "{options["output"]}"'))
+        else:
+            self.stdout.write(json.dumps(data, indent=2))
+
+        for name, stats in results.items():
+            per_item = '%.1f µs' % (stats['per_item'] * 1e6) if stats['per_item'] else '-'
+            out.write(f'-> {name}: {stats["min"] * 1000:.1f} ms ({stats["count"]} items, {per_item} per item)')
+
+        if baseline is not None:
+            regressions = compare_results(results, baseline, options['threshold'])
+            for name, ratio in regressions:
+                out.write(self.style.ERROR(f'-> Regression {name}: {ratio:.2f}x slower'))
+            if regressions:
+                raise CommandError(f'{len(regressions)} benchmarks are slower than the baseline')
+            out.write(self.style.SUCCESS('No regressions'))
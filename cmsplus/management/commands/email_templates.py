@@ -1,12 +1,20 @@
-import json
 import logging
 import sys
 
+from django.core.cache import cache
 from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
 from post_office.models import EmailTemplate
 
+from cmsplus import serialization
+from cmsplus.utils import get_content_hash
+
 logger = logging.getLogger('django')
 
+BATCH_SIZE = 500
+TEMPLATE_FIELDS = ['name', 'description', 'subject', 'content', 'html_content', 'language']
+
 
 class Command(BaseCommand):
     help = 'Import or Export email templates'
@@ -14,6 +22,8 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument('command', type=str, choices=['import', 'export'])
         parser.add_argument("-f", "--file", help="Output JSON file path")
+        parser.add_argument("--format", choices=serialization.FORMATS, default='json', help="Export: Output format")
+        parser.add_argument("--compress", choices=serialization.COMPRESSIONS, help="Export: Output compression")
         parser.add_argument("-u", "--update", type=bool, const=True, default=False, nargs='?', help="Update templates if existing")
 
     def handle(self, *args, **options):
@@ -22,39 +32,47 @@ class Command(BaseCommand):
             logger.setLevel(logging.DEBUG)
 
         if options['command'] == 'export':
-            self.stdout.write('--- Exporting EmailTemplates ---')
-            output = self.export_templates()
-            output = json.dumps(output, ensure_ascii=False, indent=False)
+            # without file the json is written to stdout, the status lines go to stderr
+            out = self.stdout if options.get('file') else self.stderr
+            out.write('--- Exporting EmailTemplates ---')
+            output = self.export_templates(out=out)
 
             if options.get('file'):
                 f_path = options.get('file')
-                with open(f_path, 'w') as f:
-                    f.write(output)
+                with open(f_path, 'wb') as f:
+                    serialization.dump_items(output, f, format=options['format'], compress=options['compress'])
                 self.stdout.write(self.style.SUCCESS(f'Export output written to "{f_path}"'))
+            elif serialization.is_binary(options['format'], options['compress']):
+                raise CommandError('Binary formats and compressed exports need an output file (-f)')
             else:
-                self.stdout.write(output)
+                for chunk in serialization.iter_dump(output):
+                    self.stdout.write(chunk.decode('utf-8'), ending='')
 
         elif options['command'] == 'import':
             self.stdout.write('--- Importing EmailTemplates ---')
-            if options.get('file'):
-                f_path = options.get('file')
-                with open(f_path, 'r') as f:
-                    data = json.loads(f.read())
-
-            elif not sys.stdin.isatty():
-                data = json.loads(sys.stdin.read())
-
-            else:
-                raise CommandError('No input defined')
-
-            self.import_templates(data, update=options.get('update'))
-
-    def export_templates(self):
-        data = []
+            try:
+                if options.get('file'):
+                    f_path = options.get('file')
+                    with open(f_path, 'rb') as f:
+                        self.import_templates(serialization.iter_items(f), update=options.get('update'))
+
+                elif not sys.stdin.isatty():
+                    self.import_templates(serialization.iter_items(sys.stdin.buffer), update=options.get('update'))
+
+                else:
+                    raise CommandError('No input defined')
+            except serialization.DecodeError as e:
+                raise CommandError(f'Input invalid: {e}')
+
+    def export_templates(self, out=None):
+        """
+        Yields the template data one by one, the counts are written to out (default: stdout) when done.
+        """
+        out = out or self.stdout
         t_count = 0
         t_count_default = 0
         fields = [f.name for f in EmailTemplate._meta.fields]
-        for t in EmailTemplate.objects.all():
+        for t in EmailTemplate.objects.select_related('default_template').iterator():
             template_data = {}
             for f in fields:
 
@@ -71,49 +89,123 @@ class Command(BaseCommand):
 
                 template_data[f] = value
 
-            data.append(template_data)
+            yield template_data
             t_count += 1
 
-        self.stdout.write(self.style.SUCCESS(f'EmailTemplates exported: {t_count}'))
-        self.stdout.write(self.style.SUCCESS(f'Default EmailTemplates: {t_count_default}'))
-        return data
+        out.write(self.style.SUCCESS(f'EmailTemplates exported: {t_count}'))
+        out.write(self.style.SUCCESS(f'Default EmailTemplates: {t_count_default}'))
+
+    @staticmethod
+    def get_template_values(template_data):
+        values = {f: template_data.get(f, '') for f in TEMPLATE_FIELDS}
+        values['default_template'] = template_data.get('default_template') or None
+        return values
+
+    @staticmethod
+    def get_existing_values(template):
+        values = {f: getattr(template, f) for f in TEMPLATE_FIELDS}
+        values['default_template'] = template.default_template.name if template.default_template else None
+        return values
+
+    def get_template(self, template_data, existing, defaults, update, counts):
+        """
+        Returns the new or changed (unsaved) template of template_data or None, if the template is skipped or
+        unchanged. defaults are the default templates by name. New templates are added to existing right away, a
+        repeated name and language updates the same template.
+        """
+        name = template_data.get('name')
+        lang = template_data.get('language')
+        logger.debug(f'Processing "{name}" (update is {bool(update)})')
+        values = self.get_template_values(template_data)
+
+        obj = existing.get((name, lang))
+        if obj is not None:
+            logger.debug('Template already in DB')
+            if not update:
+                counts['skipped'] += 1
+                return None
+            if get_content_hash(values) == get_content_hash(self.get_existing_values(obj)):
+                counts['unchanged'] += 1
+                return None
+
+        default_template = None
+        if values.pop('default_template'):
+            default_template = defaults.get(template_data['default_template'])
+            if default_template is None:
+                logger.error(f'Default EmailTemplate with name "{template_data["default_template"]}" not found')
+
+        if obj is None:
+            obj = EmailTemplate(default_template=default_template, **values)
+            existing[(name, lang)] = obj
+            logger.debug(f'Created "{obj.name}" {str(obj.language).upper()}')
+        else:
+            for field, value in values.items():
+                setattr(obj, field, value)
+            obj.default_template = default_template
+            # bulk_update does not set auto_now fields
+            obj.last_updated = timezone.now()
+            logger.debug(f'Updated "{obj.name}" {str(obj.language).upper()}')
+        return obj
+
+    @staticmethod
+    def save_templates(templates, existing, counts):
+        """
+        Bulk creates and updates templates, the created templates are fetched again (with their pks) and added to
+        existing.
+        """
+        to_create = [t for t in templates if t.pk is None]
+        to_update = [t for t in templates if t.pk is not None]
+        EmailTemplate.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+        EmailTemplate.objects.bulk_update(
+            to_update, TEMPLATE_FIELDS + ['default_template', 'last_updated'], batch_size=BATCH_SIZE)
+        counts['created'] += len(to_create)
+        counts['updated'] += len(to_update)
+
+        if to_create:
+            names = [t.name for t in to_create]
+            existing.update(((t.name, t.language), t) for t in EmailTemplate.objects.filter(name__in=names))
+
+        # EmailTemplate.save clears the cached templates by name
+        cache.delete_many({t.name for t in templates})
 
     def import_templates(self, data, update=False):
-        t_count_created = 0
-        t_count_updated = 0
-        t_count_skipped = 0
-
-        for template_data in data:
-            logger.debug(f'Processing "{template_data.get("name")}" (update is {bool(update)})')
-            name = template_data.get('name')
-            lang = template_data.get('language')
-
-            qs = EmailTemplate.objects.filter(name=name, language=lang)
-
-            if qs.count() > 0:
-                logger.debug('Template already in DB')
-                if not update:
-                    t_count_skipped += 1
+        """
+        Creates and updates the templates (matched by name and language) with bulk queries in one transaction,
+        unchanged templates are skipped. The templates are imported in batches while reading data, only the
+        translations (with a default template) are kept for a second pass after their default templates.
+        """
+        counts = dict.fromkeys(('created', 'updated', 'unchanged', 'skipped'), 0)
+        existing = {(t.name, t.language): t for t in EmailTemplate.objects.select_related('default_template')}
+        translations = []
+
+        with transaction.atomic():
+            # the templates of the batch by name and language, repeated templates are written once
+            templates = {}
+            for template_data in data:
+                if not isinstance(template_data, dict):
+                    raise CommandError(f'Invalid EmailTemplate data: {template_data!r}')
+                if template_data.get('default_template'):
+                    translations.append(template_data)
                     continue
 
-            if template_data.get('default_template'):
-                name = template_data.get('default_template')
-                try:
-                    template_data['default_template'] = EmailTemplate.objects.get(name=name, language='')
-                except EmailTemplate.DoesNotExist:
-                    logger.error(f'Default EmailTemplate with name "{name}" not found')
-                    template_data['default_template'] = None
-
-            obj, created = EmailTemplate.objects.update_or_create(**template_data)
-            if created:
-                action = 'Created'
-                t_count_created += 1
-            else:
-                action = 'Updated'
-                t_count_updated += 1
+                template = self.get_template(template_data, existing, {}, update, counts)
+                if template is not None:
+                    templates[(template.name, template.language)] = template
+                if len(templates) >= BATCH_SIZE:
+                    self.save_templates(list(templates.values()), existing, counts)
+                    templates = {}
+            self.save_templates(list(templates.values()), existing, counts)
+
+            defaults = {name: t for (name, language), t in existing.items() if language == ''}
+            templates = {}
+            for template_data in translations:
+                template = self.get_template(template_data, existing, defaults, update, counts)
+                if template is not None:
+                    templates[(template.name, template.language)] = template
+            self.save_templates(list(templates.values()), existing, counts)
 
-            logger.debug(f'{action} "{obj.name}" {str(obj.language).upper()}')
         self.stdout.write(self.style.SUCCESS('EmailTemplates'))
-        self.stdout.write(self.style.SUCCESS(f'-> created: {t_count_created}'))
-        self.stdout.write(self.style.SUCCESS(f'-> updated: {t_count_updated}'))
-        self.stdout.write(self.style.SUCCESS(f'-> skipped: {t_count_skipped}'))
+        self.stdout.write(self.style.SUCCESS(f'-> created: {counts["created"]}'))
+        self.stdout.write(self.style.SUCCESS(f'-> updated: {counts["updated"]}'))
+        self.stdout.write(self.style.SUCCESS(f'-> unchanged: {counts["unchanged"]}'))
+        self.stdout.write(self.style.SUCCESS(f'-> skipped: {counts["skipped"]}'))
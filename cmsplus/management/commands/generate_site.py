@@ -0,0 +1,298 @@
+import io
+import logging
+import random
+
+from cms.plugin_pool import plugin_pool
+from cms.utils.placeholder import get_placeholders
+from django import forms
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.management import BaseCommand, CommandError
+from django.utils.text import slugify
+
+from cmsplus.fields import SizeField, SizeUnitValidator
+from cmsplus.forms import compile_form
+from cmsplus.plugin_base import PlusPluginBase
+from cmsplus.utils import PageImporter
+
+logger = logging.getLogger('django')
+
+
+class SiteGenerator:
+    """
+    Generates the page data (as exported by PageExporter) of a synthetic site. The plugin glossaries are built
+    with the plugin forms from Faker values, a pool of variants per plugin type is reused for all plugins. The same
+    seed generates the same site.
+    """
+    variants = 20
+
+    def __init__(self, faker, seed=0, mix=None, template=None, language=None, max_depth=3, images=()):
+        self.fake = faker
+        self.fake.seed_instance(seed)
+        self.random = random.Random(seed)
+        self.template = template or settings.CMS_TEMPLATES[0][0]
+        self.language = language or settings.LANGUAGES[0][0]
+        self.max_depth = max_depth
+        self.images = list(images)
+        self.slots = [placeholder.slot for placeholder in get_placeholders(self.template)]
+
+        plugins = {plugin.__name__: plugin for plugin in plugin_pool.get_all_plugins()
+                   if issubclass(plugin, PlusPluginBase)}
+        self.explicit_mix = mix is not None
+        if mix is None:
+            mix = {name: 1 for name, plugin in plugins.items() if not plugin.require_parent}
+        unknown = set(mix) - set(plugins)
+        if unknown:
+            raise ValueError('Unknown plugin types: %s' % ', '.join(sorted(unknown)))
+        self.plugins = plugins
+        self.mix = mix
+        self.mix_names = sorted(mix)
+        self.unsupported = set()
+        self._glossaries = {}
+        self._related = {}
+
+    def get_related_pks(self, field):
+        model = field.queryset.model
+        if model not in self._related:
+            if getattr(model._meta, 'app_label', None) == 'filer' and self.images:
+                pks = [image.pk for image in self.images]
+            else:
+                pks = list(field.queryset.order_by('pk').values_list('pk', flat=True)[:100])
+            self._related[model] = pks
+        return self._related[model]
+
+    def get_field_value(self, field):
+        if isinstance(field, forms.ModelChoiceField):
+            pks = self.get_related_pks(field)
+            if not pks:
+                return ''
+            pk = self.random.choice(pks)
+            return [pk] if isinstance(field, forms.ModelMultipleChoiceField) else pk
+        if isinstance(field, forms.BooleanField):
+            return self.random.random() < 0.5
+        if isinstance(field, forms.ChoiceField):
+            choices = []
+            for value, label in field.choices:
+                if isinstance(label, (list, tuple)):
+                    choices.extend(v for v, l in label)
+                elif value not in ('', None):
+                    choices.append(value)
+            if not choices:
+                return ''
+            value = self.random.choice(choices)
+            return [value] if isinstance(field, forms.MultipleChoiceField) else value
+        if isinstance(field, (forms.IntegerField, forms.FloatField, forms.DecimalField)):
+            min_value = field.min_value if field.min_value is not None else 0
+            max_value = field.max_value if field.max_value is not None else 100
+            return self.random.randint(int(min_value), int(max_value))
+        if isinstance(field, forms.EmailField):
+            return self.fake.email()
+        if isinstance(field, forms.URLField):
+            return self.fake.url()
+        if isinstance(field, SizeField):
+            units = [unit for validator in field.validators if isinstance(validator, SizeUnitValidator)
+                     for unit in validator.allowed_units if unit != 'auto']
+            return '%d%s' % (self.random.randint(1, 100), self.random.choice(units)) if units else ''
+        if hasattr(field.widget, 'get_icons'):
+            icons = field.widget.get_icons()
+            return self.random.choice(icons)['font_class_name'] if icons else ''
+        if type(field) is forms.CharField:
+            if isinstance(field.widget, forms.Textarea):
+                return self.fake.paragraph()
+            return self.fake.sentence(nb_words=4)[:field.max_length or None]
+        return field.initial if field.initial is not None else ''
+
+    def generate_form_data(self, form_class):
+        data = {}
+        # the form instance fields, choices may be set in the form __init__ (e.g. the link types)
+        for name, field in form_class().fields.items():
+            value = self.get_field_value(field)
+            if isinstance(value, bool):
+                if value:
+                    data[name] = 'on'
+            elif value not in ('', None):
+                data[name] = value
+        return data
+
+    def generate_glossary(self, plugin, attempts=20):
+        # the compiled declared fields are collected by the form metaclass
+        form_class = type('Synthetic%s' % plugin.form.__name__, (compile_form(plugin.form), ), {})
+        for i in range(attempts):
+            data = self.generate_form_data(form_class)
+            form = form_class(data=data)
+            if not form.is_valid():
+                # invalid values are reset, dependent fields (e.g. the link type) need new random values
+                logger.debug(f'{plugin.__name__}: {form.errors.as_text()}')
+                for name in form.errors:
+                    initial = form.fields[name].initial if name in form.fields else None
+                    if initial is None:
+                        data.pop(name, None)
+                    else:
+                        data[name] = initial
+                form = form_class(data=data)
+            if form.is_valid():
+                return form.serialize_data()
+        raise ValueError(f'Could not generate valid data for {plugin.__name__}: {form.errors.as_text()}')
+
+    def get_glossary(self, plugin):
+        if plugin not in self._glossaries:
+            self._glossaries[plugin] = [self.generate_glossary(plugin) for i in range(self.variants)]
+        return self.random.choice(self._glossaries[plugin])
+
+    def get_child_names(self, name):
+        plugin = self.plugins[name]
+        if not plugin.allow_children:
+            return []
+        names = plugin.child_classes if plugin.child_classes is not None else self.mix_names
+        return [child for child in names if child in self.plugins and child not in self.unsupported and
+                (self.plugins[child].parent_classes is None or name in self.plugins[child].parent_classes)]
+
+    def generate_plugin(self, name, budget):
+        """
+        Returns the plugin data of a plugin with up to budget - 1 children of its allowed child classes.
+        """
+        try:
+            data = self.get_glossary(self.plugins[name])
+        except ValueError as e:
+            # plugins of the default mix without generatable data (e.g. required related objects) are left out
+            if self.explicit_mix:
+                raise
+            logger.warning(f'{e}, skipping {name}')
+            self.unsupported.add(name)
+            return None
+
+        plugin_data = {
+            'plugin_type': name,
+            'language': self.language,
+            'is_plusplugin': True,
+            'data': data,
+            'children': [],
+        }
+        child_names = self.get_child_names(name)
+        if child_names and budget > 1:
+            for i in range(self.random.randint(1, min(3, budget - 1))):
+                child = self.generate_plugin(self.random.choice(child_names), max(1, (budget - 1) // 3))
+                if child:
+                    plugin_data['children'].append(child)
+        return plugin_data
+
+    def generate_plugins(self, count):
+        plugins = []
+        while count > 0:
+            names = [name for name in self.mix_names if name not in self.unsupported]
+            if not names:
+                raise ValueError('No plugin type of the mix can be generated')
+            weights = [self.mix[name] for name in names]
+            plugin_data = self.generate_plugin(self.random.choices(names, weights=weights)[0], min(count, 10))
+            if plugin_data:
+                plugins.append(plugin_data)
+                count -= count_plugins(plugin_data)
+        return plugins
+
+    def generate_page(self, plugins):
+        title = self.fake.unique.catch_phrase()
+        return {
+            'title': title,
+            'slug': slugify(title),
+            'template': self.template,
+            'languages': [self.language],
+            'in_navigation': True,
+            'additional_languages': {},
+            'children': [],
+            'plugins': {slot: self.generate_plugins(plugins) for slot in self.slots},
+        }
+
+    def generate(self, pages, plugins):
+        """
+        Returns the page data of pages pages, each page is added below a random earlier page (up to max_depth).
+        """
+        roots = []
+        parents = []
+        for i in range(pages):
+            page_data = self.generate_page(plugins)
+            depth = 1
+            candidates = [parent for parent in parents if parent[0] < self.max_depth]
+            if candidates and self.random.random() < 0.8:
+                parent_depth, parent = self.random.choice(candidates)
+                parent['children'].append(page_data)
+                depth = parent_depth + 1
+            else:
+                roots.append(page_data)
+            parents.append((depth, page_data))
+        return roots
+
+
+def count_plugins(plugin_data):
+    return 1 + sum(count_plugins(child) for child in plugin_data['children'])
+
+
+def create_images(count, seed=0):
+    """
+    Creates count small filer images with random colors in the "synthetic" folder.
+    """
+    from filer.models import Folder, Image
+    from PIL import Image as PILImage
+
+    rnd = random.Random(seed)
+    folder, created = Folder.objects.get_or_create(name='synthetic', parent=None)
+    images = []
+    for i in range(count):
+        color = tuple(rnd.randint(0, 255) for c in range(3))
+        buffer = io.BytesIO()
+        PILImage.new('RGB', (64, 48), color).save(buffer, format='PNG')
+        name = 'synthetic-%d.png' % i
+        image = Image(folder=folder, original_filename=name, name='Synthetic image %d' % i)
+        image.file.save(name, ContentFile(buffer.getvalue()), save=False)
+        image.save()
+        images.append(image)
+    return images
+
+
+class Command(BaseCommand):
+    help = 'Generate a synthetic site (pages with cmsplus plugins) for load and scale testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pages", type=int, default=10, help="Number of pages")
+        parser.add_argument("--plugins", type=int, default=10, help="Number of plugins per placeholder")
+        parser.add_argument("--mix", help="Plugin types with weights, e.g. HeadingPlugin:5,BootstrapButtonPlugin:1 "
+                                          "(default: all cmsplus plugins without required parent)")
+        parser.add_argument("--images", type=int, default=0, help="Number of filer images to create and use")
+        parser.add_argument("--depth", type=int, default=3, help="Maximum page tree depth")
+        parser.add_argument("--template", help="Page template (default: the first CMS_TEMPLATES entry)")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed, the same seed generates the same site")
+        parser.add_argument("--publish", action='store_true', help="Publish the generated pages")
+
+    def handle(self, *args, **options):
+        try:
+            from faker import Faker
+        except ImportError:
+            raise CommandError('The synthetic site generator requires Faker (pip install Faker)')
+
+        mix = None
+        if options.get('mix'):
+            try:
+                mix = {name.strip(): int(weight or 1) for name, _, weight in
+                       (item.partition(':') for item in options['mix'].split(','))}
+            except ValueError:
+                raise CommandError(f'Invalid plugin mix "{options["mix"]}"')
+
+        images = create_images(options['images'], seed=options['seed']) if options['images'] else []
+        try:
+            generator = SiteGenerator(Faker(), seed=options['seed'], mix=mix, template=options.get('template'),
+                                      max_depth=options['depth'], images=images)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write('\n-- Generating site --')
+        pages_data = generator.generate(options['pages'], options['plugins'])
+        importer = PageImporter()
+        importer.import_pages(pages_data)
+        self.stdout.write(self.style.SUCCESS('Generated:'))
+        self.stdout.write(self.style.SUCCESS(f'-> Pages: {importer.page_count} '))
+        self.stdout.write(self.style.SUCCESS(f'-> Plugins: {importer.plugin_count} '))
+        if images:
+            self.stdout.write(self.style.SUCCESS(f'-> Images: {len(images)} '))
+
+        if options['publish']:
+            published = importer.publish()
+            self.stdout.write(self.style.SUCCESS(f'-> Published: {published} '))
@@ -1,11 +1,14 @@
 import json
 import logging
+import os
 import sys
-from json import JSONDecodeError
 
 from django.core.management import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
-from cmsplus.utils import PageUtils
+from cmsplus import serialization
+from cmsplus.utils import PageImporter, PageExporter, DeltaPageExporter
 
 logger = logging.getLogger('django')
 
@@ -17,7 +20,33 @@ class Command(BaseCommand):
         parser.add_argument('command', type=str, choices=['import', 'export'])
         parser.add_argument("-o", "--output", help="Output JSON file path")
         parser.add_argument("-i", "--input", help="Input JSON file path")
+        parser.add_argument("--upsert", action='store_true',
+                            help="Import: Update existing pages (matched by reverse id or path) instead of creating "
+                                 "new ones, only changed titles and plugins are written. Existing pages missing in "
+                                 "the input are kept")
+        parser.add_argument("--publish", action='store_true',
+                            help="Import: Publish the imported pages afterwards, in batches")
+        parser.add_argument("--publish-batch-size", type=int, default=50,
+                            help="Import: Number of pages published per transaction")
+        parser.add_argument("--progress", help="Import: Progress file recording the imported pages, to "
+                                               "resume a failed import (removed after a successful import)")
+        parser.add_argument("--resume", action='store_true',
+                            help="Import: Skip the pages recorded in the progress file (default: "
+                                 "<input>.progress) and record the progress")
         parser.add_argument("-p", "--page", type=int, help="Export: Start from given page id")
+        parser.add_argument("-w", "--workers", type=int, default=1,
+                            help="Export: Number of processes exporting root page trees in parallel (whole site json "
+                                 "exports only)")
+        parser.add_argument("--format", choices=serialization.FORMATS, default='json', help="Export: Output format")
+        parser.add_argument("--compress", choices=serialization.COMPRESSIONS, help="Export: Output compression")
+        parser.add_argument("--dedup", action='store_true',
+                            help="Export: Write repeated plugin subtrees once and reference them afterwards. With "
+                                 "--workers each root page tree is deduplicated on its own, subtrees repeated in "
+                                 "other root page trees are written again")
+        parser.add_argument("--since", help="Export: Only pages changed since the given ISO datetime")
+        parser.add_argument("--manifest", help="Export: Only pages changed compared to the given manifest file, "
+                                               "removed pages are exported as removal items (deleted by the "
+                                               "import). The manifest is updated afterwards")
 
     def handle(self, *args, **options):
         if options.get('verbosity') and options['verbosity'] > 1:
@@ -26,65 +55,126 @@ class Command(BaseCommand):
 
         if options.get('command'):
             if options['command'] == 'import':
-                data = None
-                data_stdin = None
-                if not sys.stdin.isatty():
-                    data_stdin = sys.stdin.read()
-
                 self.stdout.write('\n-- Importing pages --')
 
-                if not options.get('input') and not data_stdin:
+                f_path = options.get('input')
+                if not f_path and sys.stdin.isatty():
                     raise CommandError('No input provides. Either use -i (or --input) or through piping')
 
-                if options.get('input'):
-                    f_path = options.get('input')
-                    try:
-                        with open(f_path, 'r') as file:
-                            data = json.loads(file.read())
-                    except JSONDecodeError as e:
-                        self.stdout.write(self.style.ERROR(f'JSON File "{f_path}" invalid.\n{e}'))
-                    except FileNotFoundError as e:
-                        self.stdout.write(self.style.ERROR(f'File not found: {f_path}'))
-
-                elif data_stdin:
-                    try:
-                        data = json.loads(data_stdin)
-                    except JSONDecodeError as e:
-                        self.stdout.write(self.style.ERROR(f'JSON Input invalid.\n{e}'))
+                # the progress is only recorded on request
+                progress_file = options.get('progress')
+                if not progress_file and f_path and options['resume']:
+                    progress_file = f'{f_path}.progress'
+                if options['resume'] and not progress_file:
+                    raise CommandError('--resume needs a progress file (--progress) when importing from stdin')
+
+                importer = PageImporter(progress_file=progress_file, resume=options['resume'], upsert=options['upsert'])
+                # the pages are parsed and imported one at a time, see serialization.iter_pages
+                try:
+                    if f_path:
+                        with open(f_path, 'rb') as file:
+                            importer.import_page_items(serialization.iter_pages(file))
+                    else:
+                        importer.import_page_items(serialization.iter_pages(sys.stdin.buffer))
+                except serialization.DecodeError as e:
+                    message = f'Input invalid: {e}'
+                    if progress_file and importer.page_count:
+                        message += (f'\nImported {importer.page_count} pages, continue with --resume after fixing '
+                                    f'the input')
+                    raise CommandError(message)
+                except FileNotFoundError as e:
+                    self.stdout.write(self.style.ERROR(f'File not found: {f_path}'))
+                    return
 
-                PageUtils.import_pages(data)
-                page_count = PageUtils.count_pages(data)
-                plugins_count = PageUtils.count_plugins(data)
                 self.stdout.write(self.style.SUCCESS('Imported:'))
-                self.stdout.write(self.style.SUCCESS(f'-> Pages: {page_count} '))
-                self.stdout.write(self.style.SUCCESS(f'-> Plugins: {plugins_count} '))
+                if importer.skipped_count:
+                    self.stdout.write(
+                        self.style.SUCCESS(f'-> Skipped imported pages: {importer.skipped_count} '))
+                self.stdout.write(self.style.SUCCESS(f'-> Pages: {importer.page_count} '))
+                self.stdout.write(self.style.SUCCESS(f'-> Plugins: {importer.plugin_count} '))
+                if importer.removed_count:
+                    self.stdout.write(self.style.SUCCESS(f'-> Removed pages: {importer.removed_count} '))
+
+                if options['publish']:
+                    published = importer.publish(batch_size=options['publish_batch_size'])
+                    self.stdout.write(self.style.SUCCESS(f'-> Published: {published} '))
 
             elif options['command'] == 'export':
-                self.stdout.write('\n-- Exporting pages --')
+                f_path = options.get('output')
+                # without output file the json is written to stdout, status messages go to stderr
+                out = self.stdout if f_path else self.stderr
+
+                workers = options['workers']
+                if workers > 1:
+                    unsupported = [name for name, value in (
+                        ('--page', options.get('page')), ('--since', options.get('since')),
+                        ('--manifest', options.get('manifest')), ('--format msgpack', options['format'] == 'msgpack'),
+                    ) if value]
+                    if unsupported:
+                        raise CommandError(f'--workers can not be combined with {", ".join(unsupported)}')
+
+                out.write('\n-- Exporting pages --')
+                root = None
                 if options.get('page'):
                     from cms.models import Page
                     try:
-                        p = Page.objects.get(id=options['page'])
+                        root = Page.objects.select_related('node').get(id=options['page'])
                     except Page.DoesNotExist:
-                        self.stdout.write(self.style.ERROR(f'Page with id "{options["page"]}" does not exist'))
+                        out.write(self.style.ERROR(f'Page with id "{options["page"]}" does not exist'))
                         return
-                    else:
-                        data = [PageUtils(page=p).page_data]
-                else:
-                    data = PageUtils.export_whole_site()
-
-                if not options.get('output'):
-                    self.stdout.write(data)
-                    return
-
-                f_path = options.get('output')
-                json_data = json.dumps(data, indent=True, ensure_ascii=False)
-                with open(f_path, 'w') as file:
-                    file.write(json_data)
-
-                self.stdout.write(self.style.SUCCESS(f'Exported to "{f_path}":'))
-                page_count = PageUtils.count_pages(data)
-                plugins_count = PageUtils.count_plugins(data)
-                self.stdout.write(self.style.SUCCESS(f'-> Pages: {page_count} '))
-                self.stdout.write(self.style.SUCCESS(f'-> Plugins: {plugins_count} '))
 
+                since = None
+                if options.get('since'):
+                    since = parse_datetime(options['since'])
+                    if since is None:
+                        raise CommandError(f'Invalid datetime "{options["since"]}"')
+                    if timezone.is_naive(since):
+                        since = timezone.make_aware(since)
+
+                manifest = None
+                if options.get('manifest') and os.path.exists(options['manifest']):
+                    with open(options['manifest'], 'r') as file:
+                        manifest = json.load(file)
+
+                def get_exporter(write):
+                    if since or options.get('manifest'):
+                        return DeltaPageExporter(write=write, since=since, manifest=manifest, dedup=options['dedup'],
+                                                 write_manifest=bool(options.get('manifest')))
+                    return PageExporter(write=write, dedup=options['dedup'])
+
+                binary = serialization.is_binary(options['format'], options['compress'])
+                if binary and not f_path:
+                    raise CommandError('Binary formats and compressed exports need an output file (-o)')
+
+                if options['format'] == 'msgpack':
+                    if since or options.get('manifest') or options['dedup']:
+                        raise CommandError('--since, --manifest and --dedup are not supported by the msgpack format')
+                    # a msgpack stream of the root page trees
+                    exporter = PageExporter(write=None)
+                    with open(f_path, 'wb') as file:
+                        serialization.dump_items(
+                            exporter.iter_page_trees(root=root), file, format='msgpack', compress=options['compress'])
+                    out.write(self.style.SUCCESS(f'Exported to "{f_path}":'))
+                elif binary:
+                    with open(f_path, 'wb') as file, serialization.compressed_writer(file, options['compress']) as w:
+                        exporter = get_exporter(lambda s: w.write(s.encode('utf-8')))
+                        exporter.export(root=root, workers=workers)
+                    out.write(self.style.SUCCESS(f'Exported to "{f_path}":'))
+                elif f_path:
+                    with open(f_path, 'w') as file:
+                        exporter = get_exporter(file.write)
+                        exporter.export(root=root, workers=workers)
+                    out.write(self.style.SUCCESS(f'Exported to "{f_path}":'))
+                else:
+                    exporter = get_exporter(lambda s: self.stdout.write(s, ending=''))
+                    exporter.export(root=root, workers=workers)
+                    out.write(self.style.SUCCESS('Exported:'))
+
+                if options.get('manifest'):
+                    with open(options['manifest'], 'w') as file:
+                        json.dump(exporter.new_manifest, file)
+                    out.write(self.style.SUCCESS(f'-> Manifest: "{options["manifest"]}"'))
+                    out.write(self.style.SUCCESS(f'-> Removed pages: {len(exporter.new_manifest["removed"])} '))
+
+                out.write(self.style.SUCCESS(f'-> Pages: {exporter.page_count} '))
+                out.write(self.style.SUCCESS(f'-> Plugins: {exporter.plugin_count} '))
@@ -13,11 +13,12 @@ class PlusPlugin(CMSPlugin):
     _json = JSONField(dump_kwargs={'cls': cps.JSON_ENCODER_CLASS})
 
     def __str__(self):
-        return self.plugin_class.get_identifier(self)
+        return self.get_short_description()
 
     def save(self, *args, **kwargs):
         self.plugin_class.sanitize_model(self)
         self._glossary = None
+        self.__dict__.pop('_identifier', None)
         super().save(*args, **kwargs)
 
     @property
@@ -37,8 +38,7 @@ class PlusPlugin(CMSPlugin):
 
     @property
     def errors(self):
-        glossary = self.plugin_class.get_glossary(self)
-        form = self.plugin_class.form(data=glossary)
+        form = self.plugin_class.form(data=self.glossary)
         return form.errors
 
     @property
@@ -49,8 +49,24 @@ class PlusPlugin(CMSPlugin):
         """
         You may put a label field into the form to give the plugin a label
         for the cms structure view.
+
+        Identifiers are computed for the whole plugin tree of this plugin at once (if the plugins of the placeholder
+        are known, e.g. in the structure board), see cmsplus.plugin_base.prefetch_identifiers.
         """
-        return self.plugin_class.get_identifier(self)
+        if not hasattr(self, '_identifier'):
+            from cmsplus.plugin_base import prefetch_identifiers
+            # the cached placeholder only, it is never fetched here
+            placeholder = self._state.fields_cache.get('placeholder')
+            plugins = getattr(placeholder, '_all_plugins_cache', None) or []
+            root_path = self.path[:self.steplen]
+            try:
+                prefetch_identifiers([plugin for plugin in plugins if plugin.path.startswith(root_path)])
+            except Exception:
+                # e.g. invalid data of another plugin of the tree
+                pass
+            if not hasattr(self, '_identifier'):
+                prefetch_identifiers([self])
+        return self._identifier
 
     @cached_property
     def plugin_class(self):
@@ -1,26 +1,95 @@
 import logging
+from collections import defaultdict
 
 from cms.plugin_base import CMSPluginBase
+from django.core.exceptions import ValidationError
 from django.utils.safestring import mark_safe
 from filer.models.filemodels import File as FilerFileModel
 
 from cmsplus.app_settings import cmsplus_settings as cps
-from cmsplus.forms import PlusPluginFormBase
+from cmsplus.fields import PlusModelChoiceField
+from cmsplus.forms import PlusPluginFormBase, compile_form
 from cmsplus.models import PlusPlugin
 
 logger = logging.getLogger('cmsplus')
 
 
+_style_names = {}
+
+
+def get_style_names(choice_key):
+    """
+    Returns a {style: name} dict of the style choices configured in the cmsplus setting choice_key, built once per
+    settings version.
+    """
+    key = (cps.version, choice_key)
+    try:
+        return _style_names[key]
+    except KeyError:
+        style_names = _style_names[key] = dict(getattr(cps, choice_key))
+        return style_names
+
+
+def prefetch_identifiers(instances):
+    """
+    Computes the identifiers (see PlusPluginBase.get_identifier) of all given plugin instances, e.g. all plugins of
+    the structure board, with one bulk glossary hydration per plugin class. Non PlusPlugin instances and instances
+    with an identifier already are skipped.
+    """
+    groups = defaultdict(list)
+    for instance in instances:
+        if isinstance(instance, PlusPlugin) and not hasattr(instance, '_identifier'):
+            groups[instance.plugin_class].append(instance)
+
+    for plugin_class, group in groups.items():
+        plugin_class.prefetch_glossaries([instance for instance in group if not instance.__dict__.get('_glossary')])
+        for instance in group:
+            instance._identifier = plugin_class.get_identifier(instance)
+
+
 class PlusPluginBase(CMSPluginBase):
     form = PlusPluginFormBase
     model = PlusPlugin
     change_form_template = "cmsplus/admin/plugin/change_form.html"
     footnote_html = None
+    # call sanitize_glossary on save, see sanitize_model
+    sanitize_glossary_on_save = False
 
     @classmethod
-    def get_glossary(cls, instance):
-        form = cls.form(instance.data or {})
-        return form.deserialize()
+    def get_glossary(cls, instance, related=None):
+        """
+        Returns the deserialized data of the instance. related may map field names of model choice fields to
+        {pk: object} dicts of already fetched objects, see prefetch_glossaries.
+        """
+        form = compile_form(cls.form)(instance.data or {})
+        return form.deserialize(related)
+
+    @classmethod
+    def prefetch_glossaries(cls, instances):
+        """
+        Sets the glossary of all given instances (of this plugin class) with one query per model choice field.
+        """
+        form_class = compile_form(cls.form)
+        related = {}
+        for field_name, field in form_class.declared_fields.items():
+            if not isinstance(field, PlusModelChoiceField):
+                continue
+            pks = set()
+            for instance in instances:
+                try:
+                    pk = field.queryset.model._meta.pk.to_python((instance.data or {}).get(field_name))
+                except ValidationError:
+                    continue
+                if pk is not None:
+                    pks.add(pk)
+            related[field_name] = field.queryset.in_bulk(pks) if pks else {}
+
+        for instance in instances:
+            instance._glossary = cls.get_glossary(instance, related)
+
+    def get_form(self, request, obj=None, change=False, **kwargs):
+        compile_form(self.form)
+        return super().get_form(request, obj, change, **kwargs)
 
     def save_form(self, request, form, change):
         """
@@ -37,11 +106,28 @@ class PlusPluginBase(CMSPluginBase):
     @classmethod
     def sanitize_model(cls, instance):
         """
-        This method is called, before the model is saved to the database. It can be overloaded to sanitize the current
-        (_json) data dict of the instance.
+        This method is called, before the model is saved to the database. It sanitizes the current (_json) data dict
+        of the instance with sanitize_data and, if sanitize_glossary_on_save is set, with sanitize_glossary.
         """
         if instance.data is None:
             instance.data = {}
+        cls.sanitize_data(instance.data)
+        if cls.sanitize_glossary_on_save:
+            cls.sanitize_glossary(instance)
+
+    @classmethod
+    def sanitize_data(cls, data):
+        """
+        Hook to sanitize the raw (_json) data dict in place before saving. It works on the serialized primitives only
+        (no glossary deserialization, no queries), so it is cheap and safe for bulk saves.
+        """
+
+    @classmethod
+    def sanitize_glossary(cls, instance):
+        """
+        Opt-in hook (see sanitize_glossary_on_save) to sanitize the data with the deserialized instance.glossary,
+        which may query related objects.
+        """
 
     @classmethod
     def get_identifier(cls, instance):
@@ -79,7 +165,8 @@ class PlusPluginBase(CMSPluginBase):
         - default_inline_styles = { 'min-height': 'initial', ... }
         - inline_style_map = { 'fixed_height': 'height' }
         """
-        inline_styles = getattr(cls, 'default_inline_styles', {})
+        # copy, the default_inline_styles dict is shared by all renderings of the plugin
+        inline_styles = dict(getattr(cls, 'default_inline_styles', {}))
         style_map = getattr(cls, 'inline_style_map', {})
         if style_map:
             inline_styles.update(
@@ -152,8 +239,7 @@ class StylePluginMixin(object):
             try:
                 form = getattr(cls, 'form')
                 choice_key = getattr(form, 'STYLE_CHOICES')
-                style_map = dict(getattr(cps, choice_key))
-                return style_map[instance.glossary.get('extra_style')]
+                return get_style_names(choice_key)[instance.glossary.get('extra_style')]
             except Exception:
                 return instance.glossary.get('extra_style')
         elif instance.glossary.get('extra_classes'):
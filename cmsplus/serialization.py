@@ -0,0 +1,439 @@
+"""
+Export formats for pages, email templates and the clipboard: a list of items written as json or as a msgpack
+stream (one msgpack object per item), optionally gzip or zstd compressed. Imports detect the compression and the
+format from the leading bytes, iter_items parses large exports item by item and iter_pages page by page.
+
+msgpack and zstd need the optional packages, see the setup.py extras: pip install djangocms_plus[msgpack,zstd]
+"""
+import codecs
+import gzip
+import io
+import json
+from contextlib import contextmanager
+
+from django.core.exceptions import ImproperlyConfigured
+
+from cmsplus.utils import JSONEncoder, flatten_pages
+
+FORMATS = ('json', 'msgpack')
+COMPRESSIONS = ('gzip', 'zstd')
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+
+def get_msgpack():
+    try:
+        import msgpack
+    except ImportError:
+        raise ImproperlyConfigured('The msgpack format requires the msgpack package (pip install msgpack).')
+    return msgpack
+
+
+def get_zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImproperlyConfigured('zstd compression requires the zstandard package (pip install zstandard).')
+    return zstandard
+
+
+def is_binary(format='json', compress=None):
+    return format != 'json' or bool(compress)
+
+
+@contextmanager
+def compressed_writer(file, compress=None):
+    """
+    Yields a binary file object, which writes to file with the given compression. file is not closed.
+    """
+    if not compress:
+        yield file
+        return
+
+    if compress == 'gzip':
+        writer = gzip.GzipFile(fileobj=file, mode='wb')
+    elif compress == 'zstd':
+        writer = get_zstd().ZstdCompressor().stream_writer(file, closefd=False)
+    else:
+        raise ValueError('Unknown compression "%s"' % compress)
+    try:
+        yield writer
+    finally:
+        writer.close()
+
+
+def dump_items(items, file, format='json', compress=None):
+    """
+    Writes the items (any iterable) one by one to the binary file.
+    """
+    for chunk in iter_dump(items, format=format, compress=compress):
+        file.write(chunk)
+
+
+def iter_dump(items, format='json', compress=None):
+    """
+    Yields the export of items as chunks of bytes while serializing them, e.g. for a StreamingHttpResponse.
+    """
+    buffer = io.BytesIO()
+
+    def flush():
+        # compressors may buffer internally, empty chunks are skipped
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return [data] if data else []
+
+    with compressed_writer(buffer, compress) as writer:
+        if format == 'json':
+            writer.write(b'[')
+            for i, item in enumerate(items):
+                if i:
+                    writer.write(b',\n')
+                writer.write(json.dumps(item, cls=JSONEncoder, ensure_ascii=False).encode('utf-8'))
+                yield from flush()
+            writer.write(b']\n')
+        elif format == 'msgpack':
+            packer = get_msgpack().Packer(default=JSONEncoder().default)
+            for item in items:
+                writer.write(packer.pack(item))
+                yield from flush()
+        else:
+            raise ValueError('Unknown format "%s"' % format)
+    yield from flush()
+
+
+def dumps(items, format='json', compress=None):
+    file = io.BytesIO()
+    dump_items(items, file, format=format, compress=compress)
+    return file.getvalue()
+
+
+def decompress(raw):
+    if raw.startswith(GZIP_MAGIC):
+        return gzip.decompress(raw)
+    if raw.startswith(ZSTD_MAGIC):
+        return get_zstd().ZstdDecompressor().decompressobj().decompress(raw)
+    return raw
+
+
+def loads(raw):
+    """
+    Returns the list of items of an export in any format and compression.
+    """
+    if isinstance(raw, str):
+        raw = raw.encode('utf-8')
+    raw = decompress(raw)
+
+    start = raw.lstrip()[:1]
+    if not start:
+        return []
+    if start in (b'[', b'{'):
+        return json.loads(raw.decode('utf-8'))
+    return list(get_msgpack().Unpacker(io.BytesIO(raw), raw=False))
+
+
+def load(file):
+    return loads(file.read())
+
+
+class PrefixedReader(io.RawIOBase):
+    """
+    Reads the already consumed head bytes first, then the rest of the file.
+    """
+
+    def __init__(self, head, file):
+        super().__init__()
+        self.head = head
+        self.file = file
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if self.head:
+            data, self.head = self.head[:len(b)], self.head[len(b):]
+        else:
+            data = self.file.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+
+class SizeLimitExceeded(Exception):
+    """
+    Raised when more than the allowed (decompressed) bytes are read, see open_stream.
+    """
+
+
+class LimitedReader(io.RawIOBase):
+    """
+    Reads at most max_size bytes of the file, reading more raises SizeLimitExceeded.
+    """
+
+    def __init__(self, file, max_size):
+        super().__init__()
+        self.file = file
+        self.max_size = max_size
+        self.size = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        # one byte more than allowed to detect the exceeded limit
+        data = self.file.read(min(len(b), self.max_size - self.size + 1))
+        self.size += len(data)
+        if self.size > self.max_size:
+            raise SizeLimitExceeded('The input exceeds the maximum size of %s bytes' % self.max_size)
+        b[:len(data)] = data
+        return len(data)
+
+
+def open_stream(file, max_size=None):
+    """
+    Returns the decompressed binary stream of file, the compression is detected from the leading bytes. With
+    max_size reading more than max_size decompressed bytes raises SizeLimitExceeded.
+    """
+    head = file.read(len(ZSTD_MAGIC))
+    stream = io.BufferedReader(PrefixedReader(head, file))
+    if head.startswith(GZIP_MAGIC):
+        stream = gzip.GzipFile(fileobj=stream, mode='rb')
+    elif head.startswith(ZSTD_MAGIC):
+        stream = get_zstd().ZstdDecompressor().stream_reader(stream)
+    if max_size is not None:
+        stream = LimitedReader(stream, max_size)
+    return stream
+
+
+class DecodeError(ValueError):
+    """
+    Raised by iter_items and iter_pages for invalid (or truncated) input.
+    """
+
+
+class JSONStreamReader:
+    """
+    Incremental reader of a json text, which is read from the binary stream in chunks as needed. Only the not yet
+    parsed text is buffered. Lists and objects can be walked with iter_list and iter_object, values are decoded as a
+    whole with decode.
+    """
+
+    def __init__(self, stream, chunk=b'', chunk_size=1 << 16):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.utf8 = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = self.utf8.decode(chunk)
+        self.pos = 0
+        self.eof = False
+
+    def read_more(self, size=None):
+        data = self.stream.read(size or self.chunk_size)
+        self.eof = not data
+        self.buffer = self.buffer[self.pos:] + self.utf8.decode(data, final=self.eof)
+        self.pos = 0
+
+    def peek(self):
+        """
+        Returns the next character after whitespace ('' at the end of the input).
+        """
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buffer) or self.eof:
+                return self.buffer[self.pos:self.pos + 1]
+            self.read_more()
+
+    def expect(self, chars):
+        """
+        Consumes and returns the next character, which has to be one of chars.
+        """
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError('Expected one of "%s" but found "%s"' % (chars, char or 'end of input'))
+        self.pos += 1
+        return char
+
+    def decode(self):
+        """
+        Returns the next value.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            else:
+                # numbers and literals may continue in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            # incomplete value, read at least as much again as buffered to keep retries linear
+            self.read_more(max(self.chunk_size, len(self.buffer) - self.pos))
+
+    def iter_list(self):
+        """
+        Consumes a list, yields once per item: the caller has to consume each item before continuing.
+        """
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield
+            if self.expect(',]') == ']':
+                return
+
+    def iter_object(self):
+        """
+        Consumes an object, yields its keys: the caller has to consume each value before continuing.
+        """
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.decode()
+            if not isinstance(key, str):
+                raise ValueError('Expected an object key but found %r' % (key, ))
+            self.expect(':')
+            yield key
+            if self.expect(',}') == '}':
+                return
+
+
+def iter_items(file, chunk_size=1 << 16, max_size=None):
+    """
+    Yields the items of an export in any format and compression one by one, while reading the binary file (or
+    pipe) in chunks. Only the current item is kept in memory, each item is decoded as a whole (a single object as
+    the only item). Invalid input raises DecodeError, see open_stream for max_size. See iter_pages for page exports
+    and iter_trees for plugin trees.
+    """
+    try:
+        yield from _iter_items(file, chunk_size, max_size)
+    except (ValueError, EOFError, gzip.BadGzipFile) as e:
+        # json, unicode and msgpack decode errors are ValueErrors
+        raise DecodeError(str(e)) from e
+
+
+def iter_trees(file, count_node, chunk_size=1 << 16, max_size=None):
+    """
+    Same as iter_items for items with nested 'children' lists (e.g. plugin trees): count_node is called for each
+    node of a json tree when its parsing starts, so it can reject a too large tree (by raising an exception) before
+    it is built. msgpack items are decoded as a whole before their nodes are counted.
+    """
+    try:
+        yield from _iter_trees(file, count_node, chunk_size, max_size)
+    except (ValueError, EOFError, gzip.BadGzipFile) as e:
+        raise DecodeError(str(e)) from e
+
+
+def iter_pages(file, chunk_size=1 << 16):
+    """
+    Yields (depth, page_data) for the pages of a page export (see PageExporter) in document order, parents before
+    their children, depth is 0 for the root pages. The page data has no children. The json children list of a page
+    is parsed page by page, if it follows the plugins of the page (as written by PageExporter and PageUtils): only
+    the fields of the current page are kept in memory. Children lists before the plugins and msgpack items (root
+    page trees) are decoded as a whole. Invalid input raises DecodeError.
+    """
+    try:
+        yield from _iter_pages(file, chunk_size)
+    except (ValueError, EOFError, gzip.BadGzipFile) as e:
+        raise DecodeError(str(e)) from e
+
+
+def _open_items(file, chunk_size, max_size=None):
+    """
+    Returns a JSONStreamReader for json input or else an iterator of the msgpack items, None for empty input.
+    """
+    stream = open_stream(file, max_size=max_size)
+    chunk = stream.read(chunk_size)
+    while chunk and not chunk.strip():
+        chunk = stream.read(chunk_size)
+    start = chunk.lstrip()[:1]
+    if not start:
+        return None
+    if start in (b'[', b'{'):
+        return JSONStreamReader(stream, chunk, chunk_size)
+
+    def iter_msgpack(chunk):
+        unpacker = get_msgpack().Unpacker(raw=False)
+        while chunk:
+            unpacker.feed(chunk)
+            yield from unpacker
+            chunk = stream.read(chunk_size)
+    return iter_msgpack(chunk)
+
+
+def _iter_items(file, chunk_size, max_size):
+    reader = _open_items(file, chunk_size, max_size)
+    if not isinstance(reader, JSONStreamReader):
+        yield from reader or ()
+    elif reader.peek() == '{':
+        yield reader.decode()
+    else:
+        for _ in reader.iter_list():
+            yield reader.decode()
+
+
+def _iter_trees(file, count_node, chunk_size, max_size):
+    reader = _open_items(file, chunk_size, max_size)
+    if not isinstance(reader, JSONStreamReader):
+        for item in reader or ():
+            stack = [item]
+            while stack:
+                node = stack.pop()
+                count_node()
+                if isinstance(node, dict):
+                    stack.extend(node.get('children') or ())
+            yield item
+    elif reader.peek() == '{':
+        yield _decode_json_tree(reader, count_node)
+    else:
+        for _ in reader.iter_list():
+            yield _decode_json_tree(reader, count_node)
+
+
+def _decode_json_tree(reader, count_node):
+    count_node()
+    node = {}
+    for key in reader.iter_object():
+        if key == 'children' and reader.peek() == '[':
+            node[key] = [_decode_json_tree(reader, count_node) for _ in reader.iter_list()]
+        else:
+            node[key] = reader.decode()
+    return node
+
+
+def _iter_pages(file, chunk_size):
+    reader = _open_items(file, chunk_size)
+    if not isinstance(reader, JSONStreamReader):
+        for page_data in reader or ():
+            yield from flatten_pages([page_data])
+    elif reader.peek() == '{':
+        yield from _iter_json_page(reader, 0)
+    else:
+        for _ in reader.iter_list():
+            yield from _iter_json_page(reader, 0)
+
+
+def _iter_json_page(reader, depth):
+    page_data = {}
+    streamed = False
+    for key in reader.iter_object():
+        if streamed:
+            raise ValueError('Unexpected page field "%s" after the children of the page' % key)
+        if key == 'children' and 'plugins' in page_data and reader.peek() == '[':
+            for _ in reader.iter_list():
+                if not streamed:
+                    # the page is complete, its children follow one by one
+                    yield depth, dict(page_data, children=[])
+                    streamed = True
+                yield from _iter_json_page(reader, depth + 1)
+            page_data['children'] = []
+        else:
+            page_data[key] = reader.decode()
+    if not streamed:
+        yield from flatten_pages([page_data], depth)
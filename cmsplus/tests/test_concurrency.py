@@ -0,0 +1,72 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from django.test import SimpleTestCase
+
+from cmsplus.cms_plugins.bootstrap import MagicWrapperForm, BootstrapColumnForm
+from cmsplus.cms_plugins.generic.icon import IconForm, IconFieldWidget
+from cmsplus.forms import compile_form
+from cmsplus.plugin_base import PlusPluginBase
+
+THREADS = 16
+ROUNDS = 20
+
+
+class InlineStylePlugin(PlusPluginBase):
+    default_inline_styles = {'min-height': 'initial'}
+    inline_style_map = {'fixed_height': 'height', 'fixed_width': 'width'}
+
+
+class ConcurrencyTest(SimpleTestCase):
+    """
+    Renders and edits plugins from many threads at once, shared plugin and widget state must not change.
+    """
+
+    def run_threads(self, func):
+        barrier = threading.Barrier(THREADS)
+
+        def worker(n):
+            barrier.wait()
+            return [func(n, i) for i in range(ROUNDS)]
+
+        with ThreadPoolExecutor(max_workers=THREADS) as executor:
+            return [r for results in executor.map(worker, range(THREADS)) for r in results]
+
+    def test_inline_styles(self):
+        def render(n, i):
+            instance = SimpleNamespace(glossary={'fixed_height': '%dpx' % n, 'fixed_width': '%dpx' % i})
+            return n, i, InlineStylePlugin.get_inline_styles(instance)
+
+        for n, i, styles in self.run_threads(render):
+            self.assertEqual(styles, {'min-height': 'initial', 'height': '%dpx' % n, 'width': '%dpx' % i})
+        self.assertEqual(InlineStylePlugin.default_inline_styles, {'min-height': 'initial'})
+
+    def test_icon_widget(self):
+        n_icons = len(IconFieldWidget.get_icons())
+
+        def render(n, i):
+            widget = IconFieldWidget()
+            required = bool((n + i) % 2)
+            html = widget.render('icon', 'bi bi-alarm', attrs={'required': required})
+            return required, html.count('data-icon-class="cmsplus-icon-none"')
+
+        for required, no_icons in self.run_threads(render):
+            self.assertEqual(no_icons, 0 if required else 1)
+        self.assertEqual(len(IconFieldWidget.get_icons()), n_icons)
+
+    def test_edit_forms(self):
+        def edit(n, i):
+            if i % 10 == 0:
+                compile_form(MagicWrapperForm, force=True)
+            form = IconForm(data={'icon': 'bi bi-alarm', 'link_type': ''})
+            valid = form.is_valid()
+            return (valid, len(form.fields['link_type'].choices), 'mt_xl' in MagicWrapperForm.declared_fields,
+                    'col_width_xs' in BootstrapColumnForm.declared_fields)
+
+        link_type_choices = len(IconForm.get_link_type_choices())
+        for valid, choices, has_margin, has_width in self.run_threads(edit):
+            self.assertTrue(valid)
+            self.assertEqual(choices, link_type_choices)
+            self.assertTrue(has_margin)
+            self.assertTrue(has_width)
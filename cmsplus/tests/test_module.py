@@ -1,14 +1,53 @@
-from cms.api import add_plugin
-from cms.models import Placeholder
+import copy
+import io
+import json
+import os
+import tempfile
+from operator import attrgetter
+from unittest import mock
+
+from cms.api import add_plugin, create_page, create_title
+from cms.models import CMSPlugin, Page, Placeholder, UserSettings
+from cms.plugin_pool import plugin_pool
 from cms.plugin_rendering import ContentRenderer
 from cms.test_utils.testcases import CMSTestCase
+from cms.utils import copy_plugins
+from cms.utils import placeholder as placeholder_utils
+from cms.utils.plugins import assign_plugins
+from django import forms
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
 from django.template.loader import render_to_string
-from django.test import RequestFactory
+from django.test import RequestFactory, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone, translation
+from django.utils.html import strip_tags
+from faker import Faker
+from filer.models import File, Folder, FolderPermission
+from post_office.models import EmailTemplate
 
+from cmsplus import serialization
+from cmsplus.admin import CLIPBOARD_PROGRESS_KEY, ClipboardLimitExceeded, CustomPageAdmin, import_clipboard_plugins
+from cmsplus.apps import _toolbar_plugin_structs, get_toolbar_plugin_struct
+from cmsplus.cms_plugins.bootstrap import MagicWrapperForm
 from cmsplus.cms_plugins.generic.icon import IconPlugin, IconFieldWidget
+from cmsplus.cms_plugins.generic.slider import SliderPlugin
+from cmsplus.fields import PlusFilerFileSearchField
+from cmsplus.forms import compile_form
+from cmsplus.management.commands import generate_site
+from cmsplus.management.commands.generate_site import SiteGenerator
+from cmsplus.models import PlusPlugin
+from cmsplus.plugin_base import prefetch_identifiers
 from cmsplus.tests.cms_plugins import ExamplePlugin
 from cmsplus.tests.models import Test
+from cmsplus.utils import BulkPluginImporter, DeltaPageExporter, ImportContext, PageExporter, PageImporter, \
+    PageUtils, bulk_create_titles, count_page_plugins, expand_subtree_refs, generate_plugin_tree, generate_structure, \
+    get_page_key, normalize_plugin_tree, sync_plugins
 
 
 class ModuleTest(CMSTestCase):
@@ -90,3 +129,762 @@ class ModuleTest(CMSTestCase):
                                      context=test_context, request=RequestFactory())
 
         self.assertHTMLEqual(test_html, html, "Rendered HTML differs from what it should be")
+
+
+class FilerSearchTest(CMSTestCase):
+    def test_filer_search(self):
+        products = Folder.objects.create(name='products')
+        teasers = Folder.objects.create(name='2020', parent=products)
+        f1 = File.objects.create(original_filename='teaser.jpg', folder=teasers)
+        File.objects.create(original_filename='teaser.jpg', folder=products)
+        File.objects.create(original_filename='footer.jpg', folder=teasers)
+
+        results, more = PlusFilerFileSearchField.search('teaser')
+        self.assertEqual(len(results), 2)
+        self.assertFalse(more)
+
+        results, more = PlusFilerFileSearchField.search('products/2020/tea')
+        self.assertEqual(results, [(f1.pk, '2020/teaser.jpg')])
+
+        results, more = PlusFilerFileSearchField.search('', page=1, page_size=2)
+        self.assertEqual(len(results), 2)
+        self.assertTrue(more)
+
+        # only files in folders readable by the user are found
+        editor = User.objects.create(username='editor', is_staff=True)
+        FolderPermission.objects.create(folder=teasers, type=FolderPermission.THIS, user=editor, can_read=True)
+        with mock.patch('filer.models.foldermodels.filer_settings.FILER_ENABLE_PERMISSIONS', True):
+            results, more = PlusFilerFileSearchField.search('teaser', user=editor)
+        self.assertEqual(results, [(f1.pk, '2020/teaser.jpg')])
+
+        # only the selected file is rendered as option
+        field = PlusFilerFileSearchField(required=False)
+        with self.assertNumQueries(1):
+            html = field.widget.render('file', f1.pk)
+        self.assertEqual(html.count('<option'), 2)
+        self.assertIn('2020/teaser.jpg', html)
+
+
+class FormTest(CMSTestCase):
+    def test_compile_form(self):
+        compile_form(MagicWrapperForm)
+        self.assertIn('mt_xl', MagicWrapperForm.declared_fields)
+        declared_fields = MagicWrapperForm.declared_fields
+        self.assertIs(compile_form(MagicWrapperForm).declared_fields, declared_fields)
+
+        with self.settings(CMSPLUS={'DEVICES': ('xs', 'md')}):
+            compile_form(MagicWrapperForm)
+            self.assertIn('mt_md', MagicWrapperForm.declared_fields)
+            self.assertNotIn('mt_xl', MagicWrapperForm.declared_fields)
+
+        compile_form(MagicWrapperForm)
+        self.assertIn('mt_xl', MagicWrapperForm.declared_fields)
+
+        # choices are shared between form instances
+        field = MagicWrapperForm.declared_fields['mt_xl']
+        self.assertIs(copy.deepcopy(field).choices, field.choices)
+
+    def test_compile_plain_form(self):
+        form_class = type('PlainForm', (forms.Form, ), {'title': forms.CharField()})
+        self.assertIs(compile_form(form_class), form_class)
+        self.assertEqual(list(form_class.declared_fields), ['title'])
+
+    def test_sanitize_data(self):
+        instance = SliderPlugin.model(plugin_type='SliderPlugin', language='en-us')
+        instance.data = {'n_slides_xl': '3', 'n_slides_md': '', 'n_slides_sm': '1'}
+        with self.assertNumQueries(0):
+            SliderPlugin.sanitize_model(instance)
+        self.assertEqual(instance.data['breakpoints'], {1599: {'perView': 3}, 767: {'perView': 1}})
+        self.assertFalse(hasattr(instance, '_glossary'))
+
+
+class ToolbarTest(CMSTestCase):
+    def test_toolbar_plugin_struct(self):
+        plugins = plugin_pool.get_all_plugins()
+        with self.assertNumQueries(0):
+            struct = get_toolbar_plugin_struct(plugins, slot='content')
+        self.assertEqual(len(struct), len(plugins))
+        footnotes = {p.value: p.footnote_html for p in plugins if getattr(p, 'footnote_html', None)}
+        for item in struct:
+            if item['value'] in footnotes:
+                self.assertEqual(item['footnote'], strip_tags(footnotes[item['value']]))
+
+        struct[0]['name'] = 'changed'
+        self.assertEqual(get_toolbar_plugin_struct(plugins, slot='content')[1:], struct[1:])
+        self.assertNotEqual(get_toolbar_plugin_struct(plugins, slot='content')[0]['name'], 'changed')
+
+        # the order depends on the translated module names, the structure is cached per language
+        with translation.override('de'):
+            get_toolbar_plugin_struct(plugins, slot='content')
+        languages = {key[-1] for key in _toolbar_plugin_structs if key[0] == 'content'}
+        self.assertTrue({translation.get_language(), 'de'}.issubset(languages))
+
+
+class PluginTreeTest(CMSTestCase):
+    def setUp(self) -> None:
+        self.t1 = Test.objects.create(message='Test Message 1')
+        self.t2 = Test.objects.create(message='Test Message 2')
+
+    def test_prefetch_identifiers(self):
+        placeholder = Placeholder.objects.create(slot='test')
+        for t in (self.t1, self.t2, self.t1):
+            add_plugin(placeholder, ExamplePlugin, 'en', data={
+                'test_email': 'example@example.com', 'test_model_choice': t.pk, 'test_model_multiple_choice': []})
+
+        plugins = list(PlusPlugin.objects.filter(placeholder=placeholder).order_by('path'))
+        with self.assertNumQueries(1):
+            prefetch_identifiers(plugins)
+            self.assertEqual([p.glossary['test_model_choice'] for p in plugins], [self.t1, self.t2, self.t1])
+            self.assertEqual([str(p) for p in plugins], ['', '', ''])
+
+        # the structure board identifiers of the plugin tree are computed at once
+        root = plugins[0]
+        for t in (self.t2, self.t1):
+            add_plugin(placeholder, ExamplePlugin, 'en', target=root, data={
+                'test_email': 'example@example.com', 'test_model_choice': t.pk, 'test_model_multiple_choice': []})
+        placeholder = Placeholder.objects.get(pk=placeholder.pk)
+        assign_plugins(RequestFactory().get('/'), [placeholder], None, 'en')
+        cached = sorted(placeholder._all_plugins_cache, key=attrgetter('path'))
+        self.assertEqual([p.depth for p in cached], [1, 2, 2, 1, 1])
+        with self.assertNumQueries(1):
+            self.assertEqual(str(cached[0]), '')
+            self.assertEqual([hasattr(p, '_identifier') for p in cached], [True, True, True, False, False])
+            self.assertEqual([str(p) for p in cached[:3]], [''] * 3)
+
+        # an error in the plugin tree falls back to the identifier of the plugin alone
+        for p in cached[1:3]:
+            del p._identifier, p._glossary
+        prefetch_glossaries = ExamplePlugin.prefetch_glossaries
+
+        def prefetch_single(instances):
+            if len(instances) > 1:
+                raise ValueError('invalid data')
+            prefetch_glossaries(instances)
+
+        with mock.patch.object(ExamplePlugin, 'prefetch_glossaries', side_effect=prefetch_single):
+            self.assertEqual(str(cached[1]), '')
+        self.assertFalse(hasattr(cached[2], '_identifier'))
+
+    def test_generate_plugin_tree(self):
+        placeholder = Placeholder.objects.create(slot='test')
+        data = {'test_email': 'example@example.com', 'test_model_choice': self.t1.pk}
+        root = add_plugin(placeholder, ExamplePlugin, 'en', data=data)
+        child = add_plugin(placeholder, ExamplePlugin, 'en', data=data, target=root)
+        add_plugin(placeholder, ExamplePlugin, 'en', data=data, target=child)
+        add_plugin(placeholder, ExamplePlugin, 'en', data=data, target=root)
+        add_plugin(placeholder, ExamplePlugin, 'en', data=data)
+
+        with self.assertNumQueries(2):
+            tree = generate_plugin_tree(placeholder)
+
+        self.assertEqual(len(tree), 2)
+        self.assertEqual([len(p['children']) for p in tree], [2, 0])
+        self.assertEqual(len(tree[0]['children'][0]['children']), 1)
+        self.assertEqual(tree[0]['children'][0]['data'], data)
+        self.assertTrue(tree[0]['is_plusplugin'])
+
+    def test_bulk_plugin_importer(self):
+        source = Placeholder.objects.create(slot='source')
+        data = {'test_email': 'example@example.com', 'test_model_choice': self.t1.pk}
+        root = add_plugin(source, ExamplePlugin, 'en', data=data)
+        child = add_plugin(source, ExamplePlugin, 'en', data=data, target=root)
+        add_plugin(source, ExamplePlugin, 'en', data=data, target=child)
+        add_plugin(source, ExamplePlugin, 'en', data=data, target=root)
+        add_plugin(source, 'TextPlugin', 'en', body='text')
+        add_plugin(source, ExamplePlugin, 'en', data=data)
+        tree = generate_plugin_tree(source)
+
+        target = Placeholder.objects.create(slot='target')
+        importer = BulkPluginImporter(target)
+        importer.import_plugins(tree)
+        self.assertEqual(importer.plugin_count, 6)
+
+        def strip_ids(plugins):
+            return [dict(p, id=None, parent_id=None, children=strip_ids(p['children'])) for p in plugins]
+
+        self.assertEqual(strip_ids(generate_plugin_tree(target)), strip_ids(tree))
+        self.assertEqual(CMSPlugin.get_tree().count(), 12)
+        self.assertEqual(CMSPlugin.find_problems(), ([], [], [], [], []))
+        self.assertEqual(list(target.get_child_plugins().values_list('position', flat=True)), [0, 1, 2])
+
+    @override_settings(CMSPLUS={'BULK_PLUGIN_COPY': True})
+    def test_bulk_plugin_copy(self):
+        data = {'test_email': 'example@example.com'}
+        page = create_page('Home', 'home.html', 'en-us')
+        placeholder = page.get_placeholders().first()
+        for i in range(10):
+            root = add_plugin(placeholder, ExamplePlugin, 'en-us', data=data)
+            for j in range(9):
+                child_data = {'test_email': f'{i}-{j}@example.com'}
+                add_plugin(placeholder, ExamplePlugin, 'en-us', data=child_data, target=root)
+
+        # publishing 100 plugins takes a fixed number of queries (about 500 without the bulk copy)
+        with CaptureQueriesContext(connection) as queries:
+            page.publish('en-us')
+        self.assertLess(len(queries), 40)
+        public_plugins = list(page.get_public_object().get_placeholders().get(slot=placeholder.slot).get_plugins())
+        self.assertEqual(len(public_plugins), 100)
+        self.assertEqual([normalize_plugin_tree(p) for p in generate_plugin_tree(placeholder)],
+                         [normalize_plugin_tree(p) for p in generate_plugin_tree(public_plugins[0].placeholder)])
+
+        # copy and paste of a subtree
+        target = Placeholder.objects.create(slot='clipboard')
+        old_plugins = list(placeholder.get_plugins()[1:4])
+        parent_ids = [p.parent_id for p in old_plugins]
+        pairs = copy_plugins.copy_plugins_to(old_plugins, target, to_language='en-us')
+        self.assertEqual([old for new, old in pairs], old_plugins)
+        self.assertEqual([old.parent_id for new, old in pairs], parent_ids)
+        self.assertEqual([new.parent_id for new, old in pairs], [None, None, None])
+        self.assertEqual([new.get_plugin_instance()[0].glossary for new, old in pairs],
+                         [old.get_plugin_instance()[0].glossary for old in old_plugins])
+
+        # without the setting the plugins are copied by django cms
+        with override_settings(CMSPLUS={'BULK_PLUGIN_COPY': False}), CaptureQueriesContext(connection) as queries:
+            page.publish('en-us')
+        self.assertGreater(len(queries), 100)
+
+
+class PageExportTest(CMSTestCase):
+    def test_page_exporter(self):
+        home = create_page('Home', 'home.html', 'en-us')
+        about = create_page('About', 'home.html', 'en-us', parent=home)
+        create_page('Team', 'home.html', 'en-us', parent=about)
+        create_page('Contact', 'home.html', 'en-us', parent=home)
+        create_page('Shop', 'home.html', 'en-us')
+        placeholder = about.get_placeholders().first()
+        add_plugin(placeholder, ExamplePlugin, 'en-us', data={'test_email': 'example@example.com'})
+
+        out = io.StringIO()
+        exporter = PageExporter(write=out.write)
+        exporter.export()
+
+        self.assertEqual(json.loads(out.getvalue()), PageUtils.export_whole_site())
+        self.assertEqual(PageUtils(home).page_data, PageUtils.process_page(home))
+        self.assertEqual(exporter.page_count, 5)
+        self.assertEqual(exporter.plugin_count, 1)
+
+        # the workers would not see the pages of the open (test) transaction
+        parallel_out = io.StringIO()
+        with self.assertLogs('cmsplus.utils', 'WARNING'):
+            PageExporter(write=parallel_out.write).export(workers=2)
+        self.assertEqual(parallel_out.getvalue(), out.getvalue())
+        with self.assertRaisesMessage(CommandError, '--since'):
+            call_command('pages', 'export', '--workers', '2', '--since', '2020-01-01', stderr=io.StringIO())
+
+        # pages, titles, placeholders, plugins and one query per plugin model
+        with self.assertNumQueries(5):
+            PageUtils.prefetch_pages(list(PageUtils.get_subtree_pages(home)))
+
+        out = io.StringIO()
+        PageExporter(write=out.write).export(root=about)
+        self.assertEqual(json.loads(out.getvalue()), [PageUtils(about).page_data])
+
+    def test_delta_page_exporter(self):
+        def export(**kwargs):
+            out = io.StringIO()
+            exporter = DeltaPageExporter(write=out.write, **kwargs)
+            exporter.export()
+            return json.loads(out.getvalue()), exporter.new_manifest
+
+        home = create_page('Home', 'home.html', 'en-us')
+        about = create_page('About', 'home.html', 'en-us', parent=home)
+        create_page('Shop', 'home.html', 'en-us')
+
+        pages, manifest = export(manifest={})
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(len(manifest['pages']), 3)
+        self.assertEqual(export(manifest=manifest)[0], [])
+
+        since = timezone.now()
+        self.assertEqual(export(since=since)[0], [])
+        add_plugin(about.get_placeholders().first(), ExamplePlugin, 'en-us', data={'test_email': 'a@example.com'})
+
+        for kwargs in ({'manifest': manifest}, {'since': since}, {'since': since, 'write_manifest': False}):
+            pages, new_manifest = export(**kwargs)
+            self.assertEqual([p['parent_path'] for p in pages], [home.get_path('en-us')])
+        # without manifest the unchanged pages are not hashed
+        self.assertEqual(new_manifest['pages'], {})
+        about_key = get_page_key(about)
+        self.assertEqual(about_key, 'path:home/about')
+        self.assertNotEqual(export(manifest=manifest)[1]['pages'][about_key], manifest['pages'][about_key])
+
+        # title changes of the page admin
+        since = timezone.now()
+        about.title_set.update(title='About us')
+        about.save()
+        with translation.override('en-us'):
+            pages, new_manifest = export(since=since, write_manifest=False)
+        self.assertEqual([p['title'] for p in pages], ['About us'])
+
+        # removed pages are exported as removal items, which the import deletes
+        shop = Page.objects.drafts().get(title_set__slug='shop')
+        shop.reverse_id = 'shop'
+        shop.save()
+        manifest = export(manifest={})[1]
+        shop.delete()
+        pages, new_manifest = export(manifest=manifest)
+        self.assertEqual(pages, [{'removed': True, 'reverse_id': 'shop'}])
+        self.assertEqual(new_manifest['removed'], ['reverse_id:shop'])
+        shop = create_page('Shop', 'home.html', 'en-us', reverse_id='shop')
+        importer = PageImporter(upsert=True)
+        importer.import_pages(pages)
+        self.assertEqual(importer.removed_count, 1)
+        self.assertFalse(Page.objects.filter(pk=shop.pk).exists())
+
+        with self.assertRaises(ValueError):
+            DeltaPageExporter(write=io.StringIO().write, manifest=manifest).export(workers=2)
+
+    def test_dedup_export(self):
+        data = {'test_email': 'example@example.com'}
+        for title in ('Home', 'About', 'Shop'):
+            page = create_page(title, 'home.html', 'en-us')
+            root = add_plugin(page.get_placeholders().first(), ExamplePlugin, 'en-us', data=data)
+            add_plugin(page.get_placeholders().first(), ExamplePlugin, 'en-us', data=data, target=root)
+
+        out = io.StringIO()
+        PageExporter(write=out.write, dedup=True).export()
+        pages = json.loads(out.getvalue())
+        trees = [list(p['plugins'].values())[0][0] for p in pages]
+        self.assertIn('subtree_hash', trees[0])
+        self.assertEqual(trees[1], {'subtree_ref': trees[0]['subtree_hash']})
+        self.assertEqual(trees[2], trees[1])
+
+        expanded = expand_subtree_refs(pages)
+        self.assertEqual(len(expanded[2]['plugins']['content'][0]['children']), 1)
+
+        existing = set(Page.objects.drafts().values_list('pk', flat=True))
+        plugin_count = CMSPlugin.objects.count()
+        self.assertEqual(PageUtils.import_pages(expanded), 0)
+        imported = Page.objects.drafts().exclude(pk__in=existing)
+        self.assertEqual(len(imported), 3)
+        self.assertEqual(CMSPlugin.objects.count(), plugin_count + 6)
+        for page in imported:
+            plugins = list(page.get_placeholders().first().get_plugins())
+            self.assertEqual([p.depth for p in plugins], [1, 2])
+            self.assertEqual(plugins[1].get_plugin_instance()[0].glossary['test_email'], 'example@example.com')
+
+
+class ParallelPageExportTest(TransactionTestCase):
+    def test_parallel_export(self):
+        home = create_page('Home', 'home.html', 'en-us')
+        create_page('About', 'home.html', 'en-us', parent=home)
+        create_page('Shop', 'home.html', 'en-us')
+        add_plugin(home.get_placeholders().first(), ExamplePlugin, 'en-us', data={'test_email': 'a@example.com'})
+
+        out = io.StringIO()
+        PageExporter(write=out.write).export()
+        parallel_out = io.StringIO()
+        parallel_exporter = PageExporter(write=parallel_out.write)
+        with self.assertNoLogs('cmsplus.utils', 'WARNING'):
+            parallel_exporter.export(workers=2)
+        self.assertEqual(json.loads(parallel_out.getvalue()), json.loads(out.getvalue()))
+        self.assertEqual((parallel_exporter.page_count, parallel_exporter.plugin_count), (3, 1))
+
+
+class SerializationTest(CMSTestCase):
+    def test_serialization(self):
+        items = [{'plugin_type': 'ExamplePlugin', 'data': {'test_email': 'example@example.com'}, 'children': []}]
+        for compress in (None, 'gzip'):
+            raw = serialization.dumps(items, compress=compress)
+            self.assertEqual(serialization.loads(raw), items)
+        self.assertTrue(serialization.dumps(items, compress='gzip').startswith(serialization.GZIP_MAGIC))
+        self.assertEqual(serialization.loads(''), [])
+
+        raw = serialization.dumps(items * 3, compress='gzip')
+        self.assertEqual(list(serialization.iter_items(io.BytesIO(raw), chunk_size=7)), items * 3)
+
+        # an item is decoded as a whole, including its nested children
+        nested = [dict(items[0], children=items * 3)]
+        raw = serialization.dumps(nested)
+        self.assertEqual(list(serialization.iter_items(io.BytesIO(raw), chunk_size=7)), nested)
+
+        for raw in (b'[{"plugin_type": ', b'{"plugin_type"}', serialization.GZIP_MAGIC + b'invalid'):
+            with self.assertRaises(serialization.DecodeError):
+                list(serialization.iter_items(io.BytesIO(raw)))
+
+        try:
+            import msgpack  # noqa
+        except ImportError:
+            with self.assertRaises(ImproperlyConfigured):
+                serialization.dumps(items, format='msgpack')
+        else:
+            raw = serialization.dumps(items, format='msgpack', compress='gzip')
+            self.assertEqual(serialization.loads(raw), items)
+
+    def test_iter_pages(self):
+        def page(title, children=(), **kwargs):
+            return dict({'title': title, 'plugins': {'content': [{'plugin_type': 'TextPlugin', 'value': 1.5}]}},
+                        children=list(children), **kwargs)
+
+        pages_data = [page('Home', [page('About', [page('Team')]), page('Contact')]), page('Shop')]
+        expected = [(0, page('Home')), (1, page('About')), (2, page('Team')), (1, page('Contact')), (0, page('Shop'))]
+        for compress in (None, 'gzip'):
+            raw = serialization.dumps(pages_data, compress=compress)
+            self.assertEqual(list(serialization.iter_pages(io.BytesIO(raw), chunk_size=3)), expected)
+        # a single page object
+        self.assertEqual(list(serialization.iter_pages(io.BytesIO(serialization.dumps(pages_data)[1:-2]))),
+                         expected[:4])
+
+        # the pages are yielded while the children are parsed
+        raw = serialization.dumps(pages_data)
+        pages = serialization.iter_pages(io.BytesIO(raw[:raw.index(b'Contact')]), chunk_size=3)
+        self.assertEqual([next(pages) for i in range(3)], expected[:3])
+        with self.assertRaises(serialization.DecodeError):
+            next(pages)
+
+        # children lists before the plugins are decoded as a whole, no fields may follow streamed children
+        legacy = [{'title': 'Home', 'children': [page('About')], 'plugins': {}}]
+        self.assertEqual(list(serialization.iter_pages(io.BytesIO(serialization.dumps(legacy)), chunk_size=3)),
+                         [(0, dict(legacy[0], children=[])), (1, page('About'))])
+        with self.assertRaises(serialization.DecodeError):
+            list(serialization.iter_pages(io.BytesIO(b'[{"plugins": {}, "children": [{}], "title": "Home"}]')))
+
+
+class PageImportTest(CMSTestCase):
+    def test_resume_import(self):
+        for title in ('Home', 'About'):
+            create_page(title, 'home.html', 'en-us')
+        data = PageUtils.export_whole_site()
+        Page.objects.all().delete()
+
+        calls = []
+
+        def fail_second(structure, *args, **kwargs):
+            pages = generate_structure(structure, *args, **kwargs)
+            calls.append(structure)
+            if len(calls) == 2:
+                raise RuntimeError('import failed')
+            return pages
+
+        progress_file = os.path.join(tempfile.mkdtemp(), 'pages.progress')
+        with mock.patch('cmsplus.utils.generate_structure', fail_second), self.assertRaises(RuntimeError):
+            PageImporter(progress_file=progress_file, batch_size=1).import_pages(data)
+        self.assertEqual(Page.objects.drafts().count(), 1)
+
+        self.assertTrue(os.path.exists(progress_file))
+
+        self.assertEqual(PageUtils.import_pages(data, progress_file=progress_file, resume=True), 1)
+        self.assertEqual(Page.objects.drafts().count(), 2)
+        # the progress of a finished import is removed
+        self.assertFalse(os.path.exists(progress_file))
+
+    def test_upsert_import(self):
+        data = {'test_email': 'example@example.com'}
+        page = create_page('Home', 'home.html', 'en-us', reverse_id='home')
+        placeholder = page.get_placeholders().first()
+        for i in range(2):
+            add_plugin(placeholder, ExamplePlugin, 'en-us', data=data)
+        child = create_page('About', 'home.html', 'en-us', parent=page)
+        with translation.override('en-us'):
+            pages_data = PageUtils.export_whole_site()
+        plugin_ids = list(CMSPlugin.objects.order_by('path').values_list('pk', flat=True))
+
+        # unchanged data writes nothing
+        PageUtils.import_pages(pages_data, upsert=True)
+        self.assertEqual(list(Page.objects.drafts().values_list('pk', flat=True)), [page.pk, child.pk])
+        self.assertEqual(list(CMSPlugin.objects.order_by('path').values_list('pk', flat=True)), plugin_ids)
+
+        pages_data[0]['children'][0]['title'] = 'About us'
+        pages_data[0]['plugins'][placeholder.slot][1]['data']['test_email'] = 'changed@example.com'
+        PageUtils.import_pages(pages_data, upsert=True)
+        self.assertEqual(Page.objects.drafts().count(), 2)
+        self.assertEqual(Page.objects.get(pk=child.pk).get_title('en-us'), 'About us')
+        plugins = list(placeholder.get_plugins())
+        self.assertEqual(plugins[0].pk, plugin_ids[0])
+        self.assertNotEqual(plugins[1].pk, plugin_ids[1])
+        self.assertEqual(plugins[1].get_plugin_instance()[0].glossary['test_email'], 'changed@example.com')
+
+    def test_sync_plugins(self):
+        placeholder = Placeholder.objects.create(slot='content')
+        for i in range(4):
+            add_plugin(placeholder, ExamplePlugin, 'en-us', data={'test_email': f'{i}@example.com'})
+        plugin_tree = generate_plugin_tree(placeholder)
+        plugin_ids = [plugin_data['id'] for plugin_data in plugin_tree]
+
+        # a changed first plugin replaces only that plugin, the moved ones are kept
+        plugin_tree[0]['data'] = {'test_email': 'changed@example.com'}
+        plugin_tree = [plugin_tree[0], plugin_tree[3], plugin_tree[1]]
+        self.assertEqual(sync_plugins(placeholder, plugin_tree), 1)
+        synced = generate_plugin_tree(placeholder)
+        self.assertEqual([normalize_plugin_tree(p) for p in synced], [normalize_plugin_tree(p) for p in plugin_tree])
+        self.assertNotIn(synced[0]['id'], plugin_ids)
+        self.assertEqual([p['id'] for p in synced[1:]], [plugin_ids[3], plugin_ids[1]])
+        self.assertEqual(list(CMSPlugin.objects.filter(placeholder=placeholder).order_by('position').values_list(
+            'position', flat=True)), [0, 1, 2])
+
+        self.assertEqual(sync_plugins(placeholder, plugin_tree), 0)
+
+    def test_streaming_import(self):
+        home = create_page('Home', 'home.html', 'en-us')
+        about = create_page('About', 'home.html', 'en-us', parent=home)
+        create_page('Team', 'home.html', 'en-us', parent=about)
+        for page in (create_page('Shop', 'home.html', 'en-us'), about):
+            add_plugin(page.get_placeholders().first(), ExamplePlugin, 'en-us', data={'test_email': 'a@example.com'})
+
+        f_path = os.path.join(tempfile.mkdtemp(), 'pages.json.gz')
+        with translation.override('en-us'):
+            call_command('pages', 'export', '-o', f_path, '--compress', 'gzip', stdout=io.StringIO())
+        Page.objects.all().delete()
+        plugin_count = CMSPlugin.objects.count()
+
+        out = io.StringIO()
+        call_command('pages', 'import', '-i', f_path, stdout=out)
+        self.assertIn('-> Pages: 4', out.getvalue())
+        self.assertFalse(os.path.exists(f'{f_path}.progress'))
+        self.assertEqual(Page.objects.drafts().count(), 4)
+        self.assertEqual(CMSPlugin.objects.count(), plugin_count + 2)
+        team = Page.objects.drafts().get(title_set__title='Team')
+        self.assertEqual(team.get_parent_page().get_parent_page().get_title('en-us'), 'Home')
+
+    def test_invalid_import(self):
+        f_path = os.path.join(tempfile.mkdtemp(), 'pages.json')
+        with open(f_path, 'w') as file:
+            file.write('[{"title": ')
+        with self.assertRaisesMessage(CommandError, 'Input invalid'):
+            call_command('pages', 'import', '-i', f_path, stdout=io.StringIO())
+
+        # with a progress file, the imported pages can be resumed
+        page_data = {'title': 'Home', 'template': 'home.html', 'languages': ['en-us'], 'slug': 'home',
+                     'additional_languages': {}, 'children': [], 'plugins': {}}
+        with open(f_path, 'w') as file:
+            file.write(f'[{json.dumps(page_data)}, {{"title": ')
+        with self.assertRaisesMessage(CommandError, 'continue with --resume'):
+            call_command('pages', 'import', '-i', f_path, '--progress', f'{f_path}.progress', stdout=io.StringIO())
+
+        # only decode errors are reported as invalid input
+        with open(f_path, 'w') as file:
+            file.write('[{"title": "Home"}]')
+        with mock.patch('cmsplus.utils.generate_structure', side_effect=ValueError('import failed')):
+            with self.assertRaisesMessage(ValueError, 'import failed'):
+                call_command('pages', 'import', '-i', f_path, stdout=io.StringIO())
+
+    def test_import_context(self):
+        pages_data = [{
+            'title': title, 'template': 'home.html', 'languages': ['en-us'], 'slug': title.lower(),
+            'additional_languages': {}, 'children': [], 'plugins': {},
+        } for title in ('Home', 'About', 'Shop')]
+
+        with mock.patch.object(placeholder_utils, 'get_placeholders', wraps=placeholder_utils.get_placeholders) as scan:
+            with ImportContext() as context:
+                generate_structure(pages_data, context=context)
+        self.assertEqual(scan.call_count, 1)
+
+        slots = [p.slot for p in placeholder_utils.get_placeholders('home.html')]
+        for page in Page.objects.drafts():
+            self.assertEqual(sorted(p.slot for p in page.placeholders.all()), sorted(slots))
+            self.assertEqual(sorted(context.get_placeholders(page)), sorted(slots))
+
+    def test_bulk_create_titles(self):
+        fields = ('language', 'title', 'menu_title', 'page_title', 'slug', 'path', 'redirect', 'meta_description',
+                  'has_url_overwrite', 'publisher_state', 'publisher_is_draft')
+        titles = {'de': {'title': 'Über uns', 'menu_title': 'Über'}, 'fr': {'title': 'A propos', 'slug': 'propos'}}
+
+        def get_titles(page):
+            return [[getattr(t, f) for f in fields] for t in page.title_set.order_by('language')]
+
+        languages = (('en-us', 'English'), ('de', 'German'), ('fr', 'French'))
+        with override_settings(LANGUAGES=languages):
+            parent = create_page('Home', 'home.html', 'en-us')
+            page = create_page('About', 'home.html', 'en-us', parent=parent)
+            for language, values in titles.items():
+                create_title(language, page=page, **values)
+            page.refresh_from_db()
+            expected = get_titles(page), page.get_languages()
+            page.delete()
+
+            page = create_page('About', 'home.html', 'en-us', parent=parent)
+            bulk_create_titles(page, titles)
+            page.refresh_from_db()
+            self.assertEqual((get_titles(page), page.get_languages()), expected)
+
+    def test_publish_imported_pages(self):
+        data = {'test_email': 'example@example.com'}
+        home = create_page('Home', 'home.html', 'en-us')
+        root = add_plugin(home.get_placeholders().first(), ExamplePlugin, 'en-us', data=data)
+        add_plugin(home.get_placeholders().first(), ExamplePlugin, 'en-us', data=data, target=root)
+        create_page('About', 'home.html', 'en-us', parent=home)
+        with translation.override('en-us'):
+            pages_data = PageUtils.export_whole_site()
+        Page.objects.all().delete()
+
+        importer = PageImporter()
+        importer.import_pages(pages_data)
+        with mock.patch('cms.utils.plugins.copy_plugins_to_placeholder') as cms_copy:
+            self.assertEqual(importer.publish(batch_size=1), 2)
+        cms_copy.assert_not_called()
+
+        public = Page.objects.public().select_related('node').order_by('node__path')
+        self.assertEqual([p.get_title('en-us') for p in public], ['Home', 'About'])
+        plugins = list(public[0].get_placeholders().first().get_plugins())
+        self.assertEqual([p.depth for p in plugins], [1, 2])
+        self.assertEqual(plugins[1].parent_id, plugins[0].pk)
+        self.assertEqual(plugins[1].get_plugin_instance()[0].glossary['test_email'], 'example@example.com')
+        self.assertEqual(importer.publish(), 0)
+
+
+class ClipboardTest(CMSTestCase):
+    def test_clipboard_import(self):
+        source = Placeholder.objects.create(slot='content')
+        for i in range(3):
+            root = add_plugin(source, ExamplePlugin, 'en-us', data={'test_email': f'{i}@example.com'})
+            add_plugin(source, ExamplePlugin, 'en-us', data={'test_email': f'{i}-child@example.com'}, target=root)
+        plugin_tree = generate_plugin_tree(source)
+
+        file = io.BytesIO(b''.join(serialization.iter_dump(plugin_tree, compress='gzip')))
+        file.size = len(file.getvalue())
+        clipboard = Placeholder.objects.create(slot='clipboard')
+        # the batches are counted in plugins including the children: a progress update per root plugin
+        with mock.patch('cmsplus.admin.cache') as progress_cache:
+            self.assertEqual(import_clipboard_plugins(clipboard, file, 'progress', batch_size=2), 6)
+        self.assertEqual([c.args[1]['plugins'] for c in progress_cache.set.call_args_list], [2, 4, 6])
+        self.assertEqual([normalize_plugin_tree(p) for p in generate_plugin_tree(clipboard)],
+                         [normalize_plugin_tree(p) for p in plugin_tree])
+
+        file.seek(0)
+        with override_settings(CMSPLUS={'CLIPBOARD_MAX_PLUGINS': 5}), self.assertRaises(ClipboardLimitExceeded):
+            import_clipboard_plugins(Placeholder.objects.create(slot='clipboard'), file, 'progress')
+
+        # a tree is rejected while it is parsed, before the (here invalid) rest of it
+        file = io.BytesIO(b'[{"plugin_type": "ExamplePlugin", "children": [' + b'{}, ' * 6 + b'invalid')
+        file.size = len(file.getvalue())
+        with override_settings(CMSPLUS={'CLIPBOARD_MAX_PLUGINS': 5}), self.assertRaises(ClipboardLimitExceeded):
+            import_clipboard_plugins(Placeholder.objects.create(slot='clipboard'), file, 'progress')
+
+        # the decompressed size is limited
+        file = io.BytesIO(serialization.dumps([{'plugin_type': 'ExamplePlugin', 'data': ' ' * 10000}], compress='gzip'))
+        file.size = len(file.getvalue())
+        with override_settings(CMSPLUS={'CLIPBOARD_MAX_UPLOAD_SIZE': 1000}):
+            self.assertLess(file.size, 1000)
+            with self.assertRaises(serialization.SizeLimitExceeded):
+                import_clipboard_plugins(Placeholder.objects.create(slot='clipboard'), file, 'progress')
+
+    def test_clipboard_import_view(self):
+        user = self.get_superuser()
+        UserSettings.objects.create(user=user, language='en-us',
+                                    clipboard=Placeholder.objects.create(slot='clipboard'))
+        request = RequestFactory().post('/', {'json_data': '[{"plugin_type": '})
+        request.user = user
+        response = CustomPageAdmin.clipboard_import(request)
+        self.assertContains(response, 'Given json could not be converted')
+
+        # the progress is stored by user and token
+        cache.set(CLIPBOARD_PROGRESS_KEY % (user.pk, 'token'), {'plugins': 1})
+        request = RequestFactory().get('/', {'token': 'token'})
+        request.user = user
+        self.assertEqual(json.loads(CustomPageAdmin.clipboard_progress(request).content), {'plugins': 1})
+        request.user = self._create_user('staff', is_staff=True)
+        self.assertEqual(json.loads(CustomPageAdmin.clipboard_progress(request).content), {})
+
+
+class EmailTemplatesTest(CMSTestCase):
+    def test_email_templates_import(self):
+        welcome = EmailTemplate.objects.create(name='welcome', subject='Welcome', content='Hi')
+        EmailTemplate.objects.create(name='welcome', language='de', subject='Willkommen', default_template=welcome)
+        EmailTemplate.objects.create(name='bye', subject='Bye')
+
+        f_path = os.path.join(tempfile.mkdtemp(), 'templates.json')
+        call_command('email_templates', 'export', '-f', f_path, stdout=io.StringIO())
+        with open(f_path) as f:
+            data = json.load(f)
+        for template_data in data:
+            if template_data['language'] == 'de':
+                template_data['subject'] = 'Hallo'
+        data.append({'name': 'welcome', 'language': 'fr', 'subject': 'Bienvenue', 'default_template': 'welcome'})
+        with open(f_path, 'w') as f:
+            json.dump(data, f)
+
+        out = io.StringIO()
+        call_command('email_templates', 'import', '-f', f_path, '-u', stdout=out)
+        for line in ('created: 1', 'updated: 1', 'unchanged: 2'):
+            self.assertIn(line, out.getvalue())
+        self.assertEqual(EmailTemplate.objects.get(language='de').subject, 'Hallo')
+        self.assertEqual(EmailTemplate.objects.get(language='fr').default_template, welcome)
+
+    def test_email_templates_repeated_import(self):
+        f_path = os.path.join(tempfile.mkdtemp(), 'templates.json')
+        data = [{'name': 'welcome', 'language': '', 'subject': subject} for subject in ('Welcome', 'Hello')]
+        data += [{'name': 'welcome', 'language': 'de', 'subject': subject, 'default_template': 'welcome'}
+                 for subject in ('Willkommen', 'Hallo')]
+        with open(f_path, 'w') as f:
+            json.dump(data, f)
+
+        call_command('email_templates', 'import', '-f', f_path, '-u', stdout=io.StringIO())
+        self.assertEqual(sorted(EmailTemplate.objects.values_list('language', 'subject')),
+                         [('', 'Hello'), ('de', 'Hallo')])
+        self.assertEqual(EmailTemplate.objects.get(language='de').default_template.subject, 'Hello')
+
+        # without update the first one is kept
+        EmailTemplate.objects.all().delete()
+        call_command('email_templates', 'import', '-f', f_path, stdout=io.StringIO())
+        self.assertEqual(sorted(EmailTemplate.objects.values_list('language', 'subject')),
+                         [('', 'Welcome'), ('de', 'Willkommen')])
+
+    def test_email_templates_stdout_export(self):
+        welcome = EmailTemplate.objects.create(name='welcome', subject='Welcome', content='Hi')
+        EmailTemplate.objects.create(name='welcome', language='de', subject='Willkommen', default_template=welcome)
+
+        # only the json is written to stdout, the status lines go to stderr
+        out = io.StringIO()
+        err = io.StringIO()
+        call_command('email_templates', 'export', stdout=out, stderr=err)
+        self.assertEqual(sorted(t['language'] for t in json.loads(out.getvalue())), ['', 'de'])
+        self.assertIn('EmailTemplates exported: 2', err.getvalue())
+
+    def test_email_templates_invalid_import(self):
+        f_path = os.path.join(tempfile.mkdtemp(), 'templates.json')
+        for content in ('[{"name": ', '[{"name": "welcome"}, "bye"]'):
+            with open(f_path, 'w') as f:
+                f.write(content)
+            with self.assertRaises(CommandError):
+                call_command('email_templates', 'import', '-f', f_path, stdout=io.StringIO())
+        self.assertFalse(EmailTemplate.objects.exists())
+
+
+class SiteGeneratorTest(CMSTestCase):
+    def test_generate_site(self):
+        mix = {'HeadingPlugin': 2, 'BootstrapContainerPlugin': 1}
+        pages_data = SiteGenerator(Faker(), seed=1, mix=mix).generate(5, 8)
+        self.assertEqual(pages_data, SiteGenerator(Faker(), seed=1, mix=mix).generate(5, 8))
+        self.assertNotEqual(pages_data, SiteGenerator(Faker(), seed=2, mix=mix).generate(5, 8))
+
+        out = io.StringIO()
+        page_count = Page.objects.count()
+        call_command('generate_site', '--pages', '5', '--plugins', '8', '--seed', '1',
+                     '--mix', 'HeadingPlugin:2,BootstrapContainerPlugin', stdout=out)
+        self.assertEqual(Page.objects.count(), page_count + 5)
+        plugin_count = sum(count_page_plugins(page_data) for page_data in pages_data)
+        self.assertIn(f'Plugins: {plugin_count} ', out.getvalue())
+
+
+class BenchmarkTest(CMSTestCase):
+    def test_benchmark(self):
+        f_path = os.path.join(tempfile.mkdtemp(), 'benchmark.json')
+        page_count = Page.objects.count()
+        names = []
+
+        def create_images(*args, **kwargs):
+            images = generate_site.create_images(*args, **kwargs)
+            names.extend(image.file.name for image in images)
+            return images
+
+        with mock.patch('cmsplus.management.commands.benchmark.create_images', create_images):
+            call_command('benchmark', '-o', f_path, '--pages', '2', '--plugins', '5', '--images', '1', '--repeat', '2',
+                         stdout=io.StringIO())
+        self.assertEqual(Page.objects.count(), page_count)
+        self.assertEqual(len(names), 1)
+        self.assertFalse(default_storage.exists(names[0]))
+        with open(f_path) as f:
+            data = json.load(f)
+        self.assertEqual(data['pages'], 2)
+        self.assertEqual(set(data['results']), {'glossary', 'css_classes', 'image_render', 'plugin_tree',
+                                                'page_export', 'page_import', 'link_form'})
+        self.assertEqual(data['results']['glossary']['repeat'], 2)
+
+        for stats in data['results'].values():
+            if stats['per_item']:
+                stats['per_item'] /= 100
+        with open(f_path, 'w') as f:
+            json.dump(data, f)
+        with self.assertRaisesMessage(CommandError, 'slower than the baseline'):
+            call_command('benchmark', '--compare', f_path, '--only', 'glossary', '--pages', '1', '--plugins', '2',
+                         '--images', '1', '--repeat', '1', stdout=io.StringIO(), stderr=io.StringIO())
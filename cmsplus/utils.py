@@ -1,20 +1,35 @@
 import copy
 import datetime
 import decimal
+import hashlib
 import json
 import logging
+import multiprocessing
+import os
+import tempfile
+import threading
 import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby, islice
+from operator import attrgetter
 from html.parser import HTMLParser
 from io import StringIO
 from typing import List
 
-from cms.api import create_page, create_title, add_plugin
-from cms.models import Page, Placeholder, PlaceholderReference
+from cms.api import create_page, add_plugin
+from cms.constants import TEMPLATE_INHERITANCE_MAGIC
+from cms.models import Page, Placeholder, PlaceholderReference, CMSPlugin, Title
+from cms.plugin_pool import plugin_pool
 from django.core.exceptions import FieldError
+from django.db import connections, transaction
+from django.db.models import Q
 from django.db.models.query import QuerySet
 from django.utils import timezone
 from django.utils.encoding import force_str
 from django.utils.functional import Promise
+from treebeard.exceptions import PathOverflow
 
 logger = logging.getLogger('cmsplus.utils')
 
@@ -37,6 +52,274 @@ def plus_add_plugin(placeholder, plugin_data, target=None):
         plus_add_plugin(placeholder, plugin, target=generated_plugin)
 
 
+class BulkPluginImporter:
+    """
+    Imports plugin trees (see generate_plugin_tree) into a placeholder. Tree paths, depth and positions are
+    computed in memory and the CMSPlugin and PlusPlugin rows are bulk created per tree level, instead of calling
+    cms.api.add_plugin for each plugin. Plugin trees containing other than PlusPlugins, which may need their own
+    save logic, are added with plus_add_plugin.
+    """
+    batch_size = 500
+
+    def __init__(self, placeholder, sanitize=True):
+        self.placeholder = placeholder
+        # sanitize_model is skipped for verbatim copies, see bulk_copy_plugins
+        self.sanitize = sanitize
+        self.plugin_count = 0
+        # bulk created plugin model instances
+        self.created_plugins = []
+        # (CMSPlugin, parent CMSPlugin, plugin model instance) to be created
+        self._pending = []
+        self._next_root_step = None
+        self._root_positions = {}
+
+    @classmethod
+    def can_bulk_create(cls, plugin_data):
+        """
+        Whether the plugin and its children are PlusPlugins without own model fields.
+        """
+        from cmsplus.models import PlusPlugin
+
+        if not plugin_data.get('is_plusplugin'):
+            return False
+        model = plugin_pool.get_plugin(plugin_data.get('plugin_type')).model
+        if model._meta.concrete_model is not PlusPlugin:
+            return False
+        return all(cls.can_bulk_create(child) for child in plugin_data.get('children', []))
+
+    def import_plugins(self, plugins_data):
+        with transaction.atomic():
+            for plugin_data in plugins_data:
+                if self.can_bulk_create(plugin_data):
+                    self.add_plugin(plugin_data)
+                else:
+                    # add_plugin computes positions from the database
+                    self.flush()
+                    plus_add_plugin(self.placeholder, plugin_data)
+                    self._next_root_step = None
+                    self._root_positions = {}
+                    self.plugin_count += count_plugin_tree([plugin_data])
+            self.flush()
+
+    def get_root_position(self, language):
+        if language not in self._root_positions:
+            self._root_positions[language] = CMSPlugin.objects.filter(
+                language=language, parent__isnull=True, placeholder=self.placeholder).count()
+        position = self._root_positions[language]
+        self._root_positions[language] += 1
+        return position
+
+    def get_root_path(self):
+        if self._next_root_step is None:
+            last_root = CMSPlugin.get_last_root_node()
+            self._next_root_step = CMSPlugin._str2int(last_root.path) + 1 if last_root else 1
+        path = CMSPlugin._get_path(None, 1, self._next_root_step)
+        if len(path) > CMSPlugin.steplen:
+            raise PathOverflow('Path Overflow from: %s' % path)
+        self._next_root_step += 1
+        return path
+
+    def add_plugin(self, plugin_data, parent=None, position=None):
+        """
+        Prepares the plugin and its children, they are written to the database on flush.
+        """
+        children = plugin_data.get('children', [])
+        language = plugin_data.get('language')
+        plugin_class = plugin_pool.get_plugin(plugin_data.get('plugin_type'))
+
+        if parent is None:
+            path = self.get_root_path()
+            position = self.get_root_position(language)
+        else:
+            path = CMSPlugin._get_path(parent.path, parent.depth + 1, position + 1)
+
+        plugin = CMSPlugin(
+            plugin_type=plugin_class.value,
+            placeholder=self.placeholder,
+            language=language,
+            position=position,
+            path=path,
+            depth=len(path) // CMSPlugin.steplen,
+            numchild=len(children),
+        )
+        instance = plugin_class.model(
+            plugin_type=plugin_class.value,
+            placeholder=self.placeholder,
+            language=language,
+        )
+        instance.data = plugin_data.get('data')
+        instance._source_id = plugin_data.get('id')
+        if self.sanitize:
+            plugin_class.sanitize_model(instance)
+        self._pending.append((plugin, parent, instance))
+        self.plugin_count += 1
+
+        for i, child in enumerate(children):
+            self.add_plugin(child, parent=plugin, position=i)
+
+    def flush(self):
+        """
+        Creates the pending plugins level by level, parents need a pk before their children can be created.
+        """
+        from cmsplus.models import PlusPlugin
+
+        pending = sorted(self._pending, key=lambda p: p[0].depth)
+        self._pending = []
+
+        for depth, group in groupby(pending, key=lambda p: p[0].depth):
+            group = list(group)
+            plugins = [plugin for plugin, parent, instance in group]
+            for plugin, parent, instance in group:
+                plugin.parent_id = parent.pk if parent else None
+            CMSPlugin.objects.bulk_create(plugins, batch_size=self.batch_size)
+
+            # not all databases return the pks of bulk created rows, paths are unique
+            if any(plugin.pk is None for plugin in plugins):
+                pks = {}
+                for i in range(0, len(plugins), self.batch_size):
+                    paths = [plugin.path for plugin in plugins[i:i + self.batch_size]]
+                    pks.update(CMSPlugin.objects.filter(path__in=paths).values_list('path', 'pk'))
+                for plugin in plugins:
+                    plugin.pk = pks[plugin.path]
+
+            instances = []
+            for plugin, parent, instance in group:
+                plugin.set_base_attr(instance)
+                instance.cmsplugin_ptr_id = plugin.pk
+                instances.append(instance)
+            # bulk_create does not support multi table inheritance, the parent rows exist already
+            fields = PlusPlugin._meta.local_concrete_fields
+            for i in range(0, len(instances), self.batch_size):
+                PlusPlugin.objects._insert(instances[i:i + self.batch_size], fields=fields)
+            self.created_plugins.extend(instances)
+
+
+_plugin_copy = threading.local()
+
+
+def bulk_copy_plugins(plugins, placeholder, language=None):
+    """
+    Copies the path ordered plugins to placeholder with a BulkPluginImporter, the data (_json) is copied verbatim
+    without sanitize_model. Returns the new plugins in the order of plugins or None, if the plugins are not only
+    PlusPlugins without own model fields and have to be copied by django cms.
+    """
+    plugin_tree = build_plugin_tree(plugins, downcast_plugin_instances(plugins))
+    if not all(BulkPluginImporter.can_bulk_create(plugin_data) for plugin_data in plugin_tree):
+        return None
+
+    if language:
+        stack = list(plugin_tree)
+        while stack:
+            plugin_data = stack.pop()
+            plugin_data['language'] = language
+            stack.extend(plugin_data['children'])
+
+    importer = BulkPluginImporter(placeholder, sanitize=False)
+    importer.import_plugins(plugin_tree)
+    new_plugins = {instance._source_id: instance for instance in importer.created_plugins}
+    return [new_plugins[plugin.pk] for plugin in plugins if plugin.pk in new_plugins]
+
+
+def is_bulk_plugin_copy_enabled():
+    from cmsplus.app_settings import cmsplus_settings as cps
+
+    return getattr(_plugin_copy, 'active', False) or cps.BULK_PLUGIN_COPY
+
+
+def copy_plugins(placeholder, target_placeholder, language=None, root_plugin=None):
+    """
+    Replaces Placeholder.copy_plugins (used by Page.publish), see install_bulk_plugin_copy.
+    """
+    if root_plugin is None and is_bulk_plugin_copy_enabled():
+        new_plugins = bulk_copy_plugins(placeholder.get_plugins_list(language), target_placeholder, language)
+        if new_plugins is not None:
+            return new_plugins
+    return placeholder._cmsplus_copy_plugins(target_placeholder, language=language, root_plugin=root_plugin)
+
+
+def copy_plugins_to(old_plugins, to_placeholder, to_language=None, parent_plugin_id=None, no_signals=False):
+    """
+    Replaces cms.utils.copy_plugins.copy_plugins_to (used by copy and paste), see install_bulk_plugin_copy.
+    """
+    from cms.utils import copy_plugins as cms_copy_plugins
+
+    old_plugins = list(old_plugins)
+    if old_plugins and parent_plugin_id is None and is_bulk_plugin_copy_enabled():
+        # for subplugin copies the top-level plugins become root plugins, as in django cms. They are copied, the
+        # plugins of the caller (and of the django cms fallback) keep their parent.
+        old_parent_id = old_plugins[0].parent_id
+        plugins = []
+        for old_plugin in old_plugins:
+            if old_plugin.parent_id == old_parent_id:
+                plugin = copy.copy(old_plugin)
+                plugin._state = copy.copy(old_plugin._state)
+                plugin._state.fields_cache = {}
+                plugin.parent_id = None
+                plugins.append(plugin)
+            else:
+                plugins.append(old_plugin)
+
+        new_plugins = bulk_copy_plugins(plugins, to_placeholder, to_language)
+        if new_plugins is not None:
+            old_plugins_by_id = {old_plugin.pk: old_plugin for old_plugin in old_plugins}
+            return [(new_plugin, old_plugins_by_id[new_plugin._source_id]) for new_plugin in new_plugins]
+    return cms_copy_plugins._cmsplus_copy_plugins_to(
+        old_plugins, to_placeholder, to_language=to_language, parent_plugin_id=parent_plugin_id,
+        no_signals=no_signals)
+
+
+def install_bulk_plugin_copy():
+    """
+    Monkey patches the django cms plugin copy functions (publishing, copy and paste) to copy PlusPlugin trees with
+    bulk_copy_plugins, if the CMSPLUS BULK_PLUGIN_COPY setting is set or bulk_plugin_copy is active. Pasting into
+    a plugin and other plugins are copied by django cms. Bulk copies send no pre_save/post_save signals and call no
+    plugin save or copy_relations methods, which is why BULK_PLUGIN_COPY is off by default.
+    """
+    from cms.utils import copy_plugins as cms_copy_plugins
+
+    if not hasattr(Placeholder, '_cmsplus_copy_plugins'):
+        Placeholder._cmsplus_copy_plugins = Placeholder.copy_plugins
+        Placeholder.copy_plugins = copy_plugins
+    if not hasattr(cms_copy_plugins, '_cmsplus_copy_plugins_to'):
+        cms_copy_plugins._cmsplus_copy_plugins_to = cms_copy_plugins.copy_plugins_to
+        cms_copy_plugins.copy_plugins_to = copy_plugins_to
+
+
+@contextmanager
+def bulk_plugin_copy():
+    """
+    Enables the bulk plugin copy in the current thread, regardless of the BULK_PLUGIN_COPY setting.
+    """
+    install_bulk_plugin_copy()
+    active = getattr(_plugin_copy, 'active', False)
+    _plugin_copy.active = True
+    try:
+        yield
+    finally:
+        _plugin_copy.active = active
+
+
+def publish_pages(pages, batch_size=50):
+    """
+    Publishes the draft pages with unpublished changes in the given order, which has to be tree order (parents
+    first), one transaction per batch of pages. pages may be an iterator, only the current batch is kept in
+    memory. The plugins are bulk copied, see bulk_plugin_copy. Returns the number of published page languages.
+    """
+    pages = iter(pages)
+    count = 0
+    with bulk_plugin_copy():
+        while True:
+            batch = list(islice(pages, batch_size))
+            if not batch:
+                break
+            with transaction.atomic():
+                for page in batch:
+                    for language in page.get_languages():
+                        if page.is_dirty(language) and page.publish(language):
+                            count += 1
+    return count
+
+
 class JSONEncoder(json.JSONEncoder):
     """
     JSONEncoder subclass that knows how to encode date/time/timedelta,
@@ -91,10 +374,14 @@ class PageUtils:
 
     def __init__(self, page):
         self.page = page
-        self.page_data = self.process_page(page)
+        self.page_data = self.process_subtree(page)
 
     @staticmethod
-    def process_page(page: Page) -> dict:
+    def process_page(page: Page, children=True, plugin_trees=None) -> dict:
+        """
+        Returns the page data of page (and its children). plugin_trees may be the already built {slot: plugin_tree}
+        dict of the page, see prefetch_pages.
+        """
         _d_lang = {}
 
         # get values by language
@@ -140,17 +427,24 @@ class PageUtils:
             'is_home': page.is_home,
 
             'additional_languages': _d_lang,
-            'children': [],
+            # the children come last, see serialization.iter_pages
             'plugins': {},
+            'children': [],
         }
 
-        placeholder: Placeholder
-        for placeholder in page.get_placeholders():
-            if placeholder.get_plugins().count() < 1:
-                continue
+        if plugin_trees is not None:
+            page_data['plugins'] = plugin_trees
+        else:
+            placeholder: Placeholder
+            for placeholder in page.get_placeholders():
+                if placeholder.get_plugins().count() < 1:
+                    continue
 
-            plugin_tree = generate_plugin_tree(placeholder)
-            page_data['plugins'][placeholder.slot] = plugin_tree  # noqa
+                plugin_tree = generate_plugin_tree(placeholder)
+                page_data['plugins'][placeholder.slot] = plugin_tree  # noqa
+
+        if not children:
+            return page_data
 
         child: Page
         for child in page.get_child_pages():
@@ -159,6 +453,85 @@ class PageUtils:
 
         return page_data
 
+    @staticmethod
+    def get_subtree_pages(root=None):
+        """
+        Returns all draft pages (or root and its descendants) in treebeard path order.
+        """
+        pages = Page.objects.select_related('node').order_by('node__path')
+        if root is None:
+            return pages.filter(publisher_is_draft=True)
+        return pages.filter(publisher_is_draft=root.publisher_is_draft, node__path__startswith=root.node.path)
+
+    @staticmethod
+    def prefetch_pages(pages: list) -> dict:
+        """
+        Prefetches the titles, placeholders and plugins of the given (path ordered) pages with a fixed number of
+        queries (one per plugin model for the plugins) and returns the plugin trees as {page.pk: {slot: plugin_tree}}
+        to be passed to process_page.
+        """
+        pages_by_id = {page.pk: page for page in pages}
+
+        for page in pages:
+            page.title_cache = {}
+        for title in Title.objects.filter(page__in=pages_by_id):
+            pages_by_id[title.page_id].title_cache[title.language] = title
+
+        # inherited templates, parents are resolved before their children
+        templates = {}
+        for page in pages:
+            if page.template == TEMPLATE_INHERITANCE_MAGIC and page.node.parent_id in templates:
+                page._template_cache = templates[page.node.parent_id]
+            templates[page.node_id] = page.get_template()
+
+        placeholders = defaultdict(list)
+        page_placeholders = Page.placeholders.through.objects.filter(
+            page__in=pages_by_id).select_related('placeholder').order_by('placeholder_id')
+        for page_placeholder in page_placeholders:
+            placeholders[page_placeholder.page_id].append(page_placeholder.placeholder)
+
+        plugins = CMSPlugin.objects.filter(
+            placeholder__in=[ph.pk for phs in placeholders.values() for ph in phs]).order_by('placeholder_id', 'path')
+        plugins_by_placeholder = dict(
+            (key, list(group)) for key, group in groupby(plugins, attrgetter('placeholder_id')))
+        instances = downcast_plugin_instances(
+            [plugin for group in plugins_by_placeholder.values() for plugin in group])
+
+        plugin_trees = {}
+        for page in pages:
+            plugin_trees[page.pk] = trees = {}
+            for placeholder in placeholders[page.pk]:
+                placeholder_plugins = plugins_by_placeholder.get(placeholder.pk)
+                if not placeholder_plugins:
+                    continue
+                if len(placeholder_plugins) == 1 and placeholder_plugins[0].plugin_type == 'PlaceholderPlugin':
+                    trees[placeholder.slot] = generate_plugin_tree(placeholder)
+                else:
+                    trees[placeholder.slot] = build_plugin_tree(placeholder_plugins, instances)
+        return plugin_trees
+
+    @staticmethod
+    def process_subtree(page: Page) -> dict:
+        """
+        Same as process_page, but all pages of the subtree are fetched at once, see prefetch_pages.
+        """
+        pages = list(PageUtils.get_subtree_pages(page))
+        plugin_trees = PageUtils.prefetch_pages(pages)
+
+        page_data = None
+        # (depth, page_data) of the current page and its ancestors
+        stack = []
+        for p in pages:
+            data = PageUtils.process_page(p, children=False, plugin_trees=plugin_trees[p.pk])
+            while stack and stack[-1][0] >= p.node.depth:
+                stack.pop()
+            if stack:
+                stack[-1][1]['children'].append(data)
+            else:
+                page_data = data
+            stack.append((p.node.depth, data))
+        return page_data
+
     @staticmethod
     def export_whole_site():
         pages_data = []
@@ -168,8 +541,13 @@ class PageUtils:
         return pages_data
 
     @staticmethod
-    def import_pages(pages_data: list):
-        generate_structure(pages_data)
+    def import_pages(pages_data: list, progress_file=None, resume=False, upsert=False):
+        """
+        Imports the pages, see PageImporter. Returns the number of skipped pages.
+        """
+        importer = PageImporter(progress_file=progress_file, resume=resume, upsert=upsert)
+        importer.import_pages(pages_data)
+        return importer.skipped_count
 
     @staticmethod
     def count_pages(page_data, count=0):
@@ -201,21 +579,505 @@ class PageUtils:
         return count
 
 
-def generate_plugin_tree(placeholder, language=None):
-    _plugins = []
+def count_plugin_tree(plugin_tree: list) -> int:
+    return sum(1 + count_plugin_tree(p.get('children', [])) for p in plugin_tree)
+
+
+def count_page_plugins(page_data: dict) -> int:
+    count = sum(count_plugin_tree(plugin_tree) for plugin_tree in page_data.get('plugins', {}).values())
+    return count + sum(count_page_plugins(child) for child in page_data.get('children', []))
+
+
+def flatten_pages(pages_data, depth=0):
+    """
+    Yields (depth, page_data) for the nested pages in document order, parents before their children. The page data
+    is copied without the children.
+    """
+    for page_data in pages_data:
+        yield depth, dict(page_data, children=[])
+        yield from flatten_pages(page_data.get('children', []), depth + 1)
+
+
+class PageImporter:
+    """
+    Imports the pages one by one in document order: import_pages takes nested page trees (any iterable),
+    import_page_items the (depth, page_data) items of serialization.iter_pages, so large exports are imported while
+    they are parsed. The pages are imported in batches of batch_size pages, each in its own transaction. With a
+    progress_file the imported pages are recorded (position and content hash) after each batch, with resume those
+    are skipped. The progress file is removed once all pages are imported. With upsert existing pages are updated,
+    see generate_structure. The removal items of delta exports delete the matching pages, see remove_page.
+    """
+
+    def __init__(self, progress_file=None, resume=False, upsert=False, batch_size=100):
+        self.progress_file = progress_file
+        self.upsert = upsert
+        self.batch_size = batch_size
+        self.page_count = 0
+        self.plugin_count = 0
+        self.skipped_count = 0
+        self.removed_count = 0
+        self.context = ImportContext()
+        self.done = set()
+        if resume and progress_file and os.path.exists(progress_file):
+            with open(progress_file, 'r') as f:
+                self.done = set(json.load(f)['pages'])
+
+    def import_pages(self, pages_data):
+        self.import_page_items(flatten_pages(pages_data))
+
+    def import_page_items(self, items):
+        with self.context:
+            self._import_pages(items)
+        if self.progress_file and os.path.exists(self.progress_file):
+            os.remove(self.progress_file)
+
+    def _import_pages(self, items):
+        # subtrees of deduplicated exports, referenced by the following pages
+        subtrees = {}
+        # (depth, page) of the current page and its ancestors, page is None if it was not imported
+        stack = []
+        for _, batch in groupby(enumerate(items), key=lambda item: item[0] // self.batch_size):
+            keys = []
+            with transaction.atomic():
+                for i, (depth, page_data) in batch:
+                    while stack and stack[-1][0] >= depth:
+                        stack.pop()
+                    parent = stack[-1][1] if stack else None
+                    if stack and parent is None:
+                        logger.error(f'Skipping page "{page_data.get("title")}", its parent page was not imported')
+                        stack.append((depth, None))
+                        continue
+
+                    expand_subtree_refs([page_data], subtrees)
+                    key = '%d:%s' % (i, get_content_hash(page_data))
+                    if page_data.get('removed'):
+                        # removal items of delta exports
+                        page = None
+                        if key not in self.done:
+                            if remove_page(page_data):
+                                logger.info(f'Removed page "{page_data.get("reverse_id") or page_data.get("path")}"')
+                                self.removed_count += 1
+                            keys.append(key)
+                    elif key in self.done:
+                        logger.info(f'Skipping imported page "{page_data.get("title")}"')
+                        self.skipped_count += 1
+                        # the parent of the following child pages
+                        page = find_page(page_data, parent) if 'parent_path' not in page_data else None
+                    else:
+                        pages = generate_structure([page_data], parent=parent, upsert=self.upsert,
+                                                   context=self.context)
+                        page = pages[0] if pages else None
+                        self.page_count += len(pages)
+                        self.plugin_count += count_page_plugins(page_data)
+                        keys.append(key)
+                    stack.append((depth, page))
+
+            self.done.update(keys)
+            if self.progress_file and keys:
+                write_import_progress(self.progress_file, self.done)
+
+    def publish(self, batch_size=50):
+        """
+        Publishes the imported pages, see publish_pages. The pages are loaded batch_size at a time in import
+        order, which is tree order.
+        """
+        return publish_pages(self._iter_imported_pages(batch_size), batch_size=batch_size)
+
+    def _iter_imported_pages(self, batch_size):
+        pks = self.context.imported_pages
+        for i in range(0, len(pks), batch_size):
+            yield from (Page.objects.drafts().filter(pk__in=pks[i:i + batch_size])
+                        .select_related('node').order_by('node__path'))
+
+
+class PageExporter:
+    """
+    Streams the page tree as JSON to write (e.g. file.write), the output has the same structure as
+    PageUtils.export_whole_site. Pages are walked in treebeard path order and written one by one, so only the
+    current page is kept in memory. page_count and plugin_count are counted while writing.
+    """
+
+    chunk_size = 100
+    copy_buffer_size = 1024 * 1024
+
+    def __init__(self, write, dedup=False):
+        self.write = write
+        self.dedup = dedup
+        self.page_count = 0
+        self.plugin_count = 0
+        # hashes of the already written plugin subtrees, see dedup_plugin_trees
+        self._subtree_hashes = set()
+
+    def get_pages(self, root=None):
+        """
+        Yields (page, plugin_trees) in path order, pages are prefetched in chunks, see PageUtils.prefetch_pages.
+        """
+        pages = PageUtils.get_subtree_pages(root).iterator(chunk_size=self.chunk_size)
+        while True:
+            chunk = list(islice(pages, self.chunk_size))
+            if not chunk:
+                break
+            plugin_trees = self.prefetch_pages(chunk)
+            for page in chunk:
+                yield page, plugin_trees[page.pk]
+
+    def prefetch_pages(self, pages):
+        return PageUtils.prefetch_pages(pages)
+
+    def get_page_data(self, page, plugin_trees):
+        page_data = PageUtils.process_page(page, children=False, plugin_trees=plugin_trees)
+        for plugin_tree in page_data['plugins'].values():
+            self.plugin_count += count_plugin_tree(plugin_tree)
+        self.page_count += 1
+        if self.dedup:
+            page_data['plugins'] = self.dedup_plugin_trees(page_data['plugins'])
+        return page_data
+
+    def dedup_plugin_trees(self, plugin_trees):
+        """
+        Replaces repeated root plugin subtrees of the placeholders by references: the first occurrence of a subtree
+        is written in full with its 'subtree_hash', later occurrences as {'subtree_ref': <hash>}. Subtrees are
+        hashed without ids, parent ids and depth. See expand_subtree_refs.
+        """
+        deduped = {}
+        for slot, plugin_tree in plugin_trees.items():
+            deduped[slot] = []
+            for plugin_data in plugin_tree:
+                subtree_hash = get_content_hash(normalize_plugin_tree(plugin_data))
+                if subtree_hash in self._subtree_hashes:
+                    deduped[slot].append({'subtree_ref': subtree_hash})
+                else:
+                    self._subtree_hashes.add(subtree_hash)
+                    deduped[slot].append(dict(plugin_data, subtree_hash=subtree_hash))
+        return deduped
+
+    def iter_page_trees(self, root=None):
+        """
+        Yields the nested page data (see PageUtils) of each root page of the site or of root only.
+        """
+        if root is not None:
+            roots = [root]
+        else:
+            roots = PageUtils.get_subtree_pages().filter(node__depth=1).iterator()
+        for page in roots:
+            page_data = PageUtils(page).page_data
+            self.page_count += PageUtils.count_pages([page_data])
+            self.plugin_count += count_page_plugins(page_data)
+            yield page_data
+
+    def export(self, root=None, workers=1):
+        """
+        Writes the pages of the whole site or root and its descendants. With workers > 1 the root page trees of
+        the site are exported in parallel processes and written in order. Inside a transaction the pages are
+        exported sequentially: the workers use their own connections, which would not see uncommitted changes.
+        """
+        if workers > 1 and any(connection.in_atomic_block for connection in connections.all()):
+            logger.warning('Exporting sequentially, parallel exports are not possible inside a transaction')
+            workers = 1
+
+        self.write('[')
+        if workers > 1 and root is None:
+            self.write_trees_parallel(workers)
+        else:
+            self.write_tree(root)
+        self.write('\n]\n')
+
+    def write_tree(self, root=None):
+        """
+        Writes the comma separated pages (without the surrounding list).
+        """
+        # depths of the pages whose children lists are still open
+        open_depths = []
+        first = True
+
+        for page, plugin_trees in self.get_pages(root):
+            depth = page.node.depth
+            while open_depths and open_depths[-1] >= depth:
+                open_depths.pop()
+                self.write(']}')
+                first = False
+
+            page_data = self.get_page_data(page, plugin_trees)
+            del page_data['children']
+            page_json = json.dumps(page_data, cls=JSONEncoder, ensure_ascii=False)
+
+            # write the page without closing brace and open its children list
+            self.write('\n' if first else ',\n')
+            self.write(page_json[:-1] + ', "children": [')
+            open_depths.append(depth)
+            first = True
+
+        while open_depths:
+            open_depths.pop()
+            self.write(']}')
+
+    def write_trees_parallel(self, workers):
+        """
+        Exports each root page tree to a temporary file in a process pool and writes the files in page order.
+        The workers are forked and open their own database connections.
+        """
+        root_ids = list(PageUtils.get_subtree_pages().filter(node__depth=1).values_list('pk', flat=True))
+        # forked workers must not share the connections of this process
+        connections.close_all()
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tasks = [(pk, os.path.join(tmp_dir, '%s.json' % pk), self.dedup) for pk in root_ids]
+            mp_context = multiprocessing.get_context('fork')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as executor:
+                results = executor.map(export_page_tree, tasks)
+                for i, ((pk, f_path, dedup), (page_count, plugin_count)) in enumerate(zip(tasks, results)):
+                    if i:
+                        self.write(',')
+                    with open(f_path, 'r') as file:
+                        for chunk in iter(lambda: file.read(self.copy_buffer_size), ''):
+                            self.write(chunk)
+                    os.remove(f_path)
+                    self.page_count += page_count
+                    self.plugin_count += plugin_count
+
+
+def normalize_plugin_tree(plugin_data):
+    """
+    Returns the plugin data without the tree position dependent keys, e.g. to compare or hash plugin subtrees.
+    """
+    data = {k: v for k, v in plugin_data.items() if k not in ('id', 'parent_id', 'depth', 'children', 'subtree_hash')}
+    data['children'] = [normalize_plugin_tree(child) for child in plugin_data.get('children', [])]
+    return data
+
+
+def expand_subtree_refs(pages_data, subtrees=None):
+    """
+    Replaces the subtree references of deduplicated exports (see PageExporter.dedup_plugin_trees) by the
+    referenced plugin subtrees, in document order. The subtrees are shared, not copied.
+    """
+    if subtrees is None:
+        subtrees = {}
+    for page in pages_data:
+        for slot, plugin_tree in page.get('plugins', {}).items():
+            for i, plugin_data in enumerate(plugin_tree):
+                if 'subtree_ref' in plugin_data:
+                    try:
+                        plugin_tree[i] = subtrees[plugin_data['subtree_ref']]
+                    except KeyError:
+                        raise ValueError('Unknown plugin subtree reference "%s"' % plugin_data['subtree_ref'])
+                elif 'subtree_hash' in plugin_data:
+                    subtrees[plugin_data['subtree_hash']] = plugin_data
+        expand_subtree_refs(page.get('children', []), subtrees)
+    return pages_data
+
+
+def get_content_hash(data):
+    return hashlib.sha1(json.dumps(data, cls=JSONEncoder, sort_keys=True).encode('utf-8')).hexdigest()
 
+
+def write_import_progress(progress_file, pages):
+    # replace the file atomically, an interrupted write must not lose the recorded progress
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(progress_file)), suffix='.progress')
+    with os.fdopen(fd, 'w') as f:
+        json.dump({'pages': sorted(pages)}, f)
+    os.replace(tmp_path, progress_file)
+
+
+class DeltaPageExporter(PageExporter):
+    """
+    Exports only pages changed since a datetime and/or pages whose content hash differs from a previous manifest
+    (see new_manifest). A page counts as changed since the datetime, if the page (Page.changed_date, the page admin
+    saves the page with its title changes) or one of its plugins (CMSPlugin.changed_date) was changed or a title was
+    added after it. Titles have no change date of their own, title updates without saving the page and deleted
+    plugins are only detected with a manifest.
+
+    Changed pages are written as a flat list, each page has no children but the 'parent_path' of its parent page
+    (None for root pages). new_manifest holds the page hashes and the removed pages by page key (see get_page_key),
+    the removed pages of a whole site export are written as removal items after the pages, see get_removal_data.
+    Without write_manifest (and manifest) unchanged pages are neither serialized nor hashed. The pages are exported
+    sequentially, parallel exports (workers) are not supported.
+    """
+
+    def __init__(self, write, since=None, manifest=None, dedup=False, write_manifest=True):
+        super().__init__(write, dedup=dedup)
+        self.since = since
+        self.manifest = manifest or {}
+        self.hash_pages = write_manifest or bool(self.manifest) or not since
+        self.new_manifest = {'pages': {}, 'removed': []}
+        self._changed_page_ids = set()
+
+    def get_changed_page_ids(self, pages):
+        page_ids = [page.pk for page in pages]
+        changed_page_ids = {page.pk for page in pages if page.changed_date >= self.since}
+        changed_page_ids.update(Title.objects.filter(
+            page__in=page_ids, creation_date__gte=self.since).values_list('page', flat=True))
+        changed_page_ids.update(CMSPlugin.objects.filter(
+            placeholder__page__in=page_ids, changed_date__gte=self.since,
+        ).values_list('placeholder__page', flat=True))
+        return changed_page_ids
+
+    def prefetch_pages(self, pages):
+        if self.since:
+            self._changed_page_ids = self.get_changed_page_ids(pages)
+        if self.hash_pages:
+            return super().prefetch_pages(pages)
+
+        # the plugins of unchanged pages are not needed, their titles are (for the parent paths)
+        changed_pages = [page for page in pages if page.pk in self._changed_page_ids]
+        plugin_trees = super().prefetch_pages(changed_pages)
+        unchanged_pages = {page.pk: page for page in pages if page.pk not in self._changed_page_ids}
+        for page in unchanged_pages.values():
+            page.title_cache = {}
+        for title in Title.objects.filter(page__in=unchanged_pages):
+            unchanged_pages[title.page_id].title_cache[title.language] = title
+        plugin_trees.update((pk, {}) for pk in unchanged_pages)
+        return plugin_trees
+
+    def export(self, root=None, workers=1):
+        if workers > 1:
+            raise ValueError('Delta exports do not support parallel exports (workers)')
+        super().export(root=root)
+
+    def is_changed(self, page, key, page_hash):
+        if not self.since and not self.manifest:
+            return True
+        if self.since and page.pk in self._changed_page_ids:
+            return True
+        return bool(self.manifest) and self.manifest.get('pages', {}).get(key) != page_hash
+
+    def write_tree(self, root=None):
+        # (depth, path) of the current page and its ancestors
+        stack = []
+        first = True
+
+        for page, plugin_trees in self.get_pages(root):
+            depth = page.node.depth
+            while stack and stack[-1][0] >= depth:
+                stack.pop()
+
+            if stack:
+                parent_path = stack[-1][1]
+            else:
+                parent = page.get_parent_page()
+                parent_path = parent.get_path(parent.get_languages()[0]) if parent else None
+            stack.append((depth, page.get_path(page.get_languages()[0])))
+
+            key = get_page_key(page)
+            if self.hash_pages:
+                page_data = PageUtils.process_page(page, children=False, plugin_trees=plugin_trees)
+                page_hash = get_content_hash(page_data)
+                self.new_manifest['pages'][key] = page_hash
+                if not self.is_changed(page, key, page_hash):
+                    continue
+            elif page.pk in self._changed_page_ids:
+                page_data = PageUtils.process_page(page, children=False, plugin_trees=plugin_trees)
+            else:
+                continue
+
+            page_data['parent_path'] = parent_path
+            for plugin_tree in page_data['plugins'].values():
+                self.plugin_count += count_plugin_tree(plugin_tree)
+            self.page_count += 1
+            if self.dedup:
+                page_data['plugins'] = self.dedup_plugin_trees(page_data['plugins'])
+
+            self.write('\n' if first else ',\n')
+            self.write(json.dumps(page_data, cls=JSONEncoder, ensure_ascii=False))
+            first = False
+
+        if root is None and self.hash_pages:
+            self.new_manifest['removed'] = sorted(
+                set(self.manifest.get('pages', {})) - set(self.new_manifest['pages']))
+            for key in self.new_manifest['removed']:
+                self.write('\n' if first else ',\n')
+                self.write(json.dumps(get_removal_data(key), cls=JSONEncoder, ensure_ascii=False))
+                first = False
+
+
+def get_page_key(page):
+    """
+    Returns the key of page in delta manifests: its reverse id or else its path, as matched by the upsert import.
+    """
+    if page.reverse_id:
+        return 'reverse_id:%s' % page.reverse_id
+    return 'path:%s' % page.get_path(page.get_languages()[0])
+
+
+def get_removal_data(key):
+    """
+    Returns the removal item of a delta export for the page key, e.g. {'removed': True, 'path': 'about/team'}, see
+    remove_page.
+    """
+    field, value = key.split(':', 1)
+    return {'removed': True, field: value}
+
+
+def remove_page(page_data):
+    """
+    Deletes the draft page (and its descendants) of a removal item, matched by reverse_id or path. Returns whether
+    the page existed.
+    """
+    if page_data.get('reverse_id'):
+        page = Page.objects.drafts().filter(reverse_id=page_data['reverse_id']).first()
+    else:
+        page = get_page_by_path(page_data.get('path'))
+    if page is None:
+        return False
+    page.delete()
+    return True
+
+
+def export_page_tree(task):
+    """
+    Process pool task of PageExporter.write_trees_parallel: writes the page tree of the root page to f_path and
+    returns the page and plugin counts.
+    """
+    page_id, f_path, dedup = task
+    root = Page.objects.select_related('node').get(pk=page_id)
+    with open(f_path, 'w') as file:
+        exporter = PageExporter(write=file.write, dedup=dedup)
+        exporter.write_tree(root)
+    return exporter.page_count, exporter.plugin_count
+
+
+def downcast_plugin_instances(plugins):
+    """
+    Returns a {pk: instance} dict of the downcasted plugin instances for the given CMSPlugins with one query per
+    plugin model. Plugins without an instance (e.g. broken plugins) are missing in the dict.
+    """
+    pks_by_model = defaultdict(list)
+    for plugin in plugins:
+        pks_by_model[plugin.get_plugin_class().model].append(plugin.pk)
+
+    instances = {}
+    for model, pks in pks_by_model.items():
+        instances.update(model._default_manager.in_bulk(pks))
+    return instances
+
+
+def generate_plugin_tree(placeholder, language=None):
     if language:
         plugins = placeholder.get_plugins().filter(language=language)
     else:
         plugins = placeholder.get_plugins()
+    plugins = list(plugins)
 
     # Check if whole placeholder is copied
     if len(plugins) == 1 and plugins[0].plugin_type == 'PlaceholderPlugin':
-        plugins = PlaceholderReference.objects.get(id=plugins[0].id).placeholder_ref.get_plugins()
+        plugins = list(PlaceholderReference.objects.get(id=plugins[0].id).placeholder_ref.get_plugins())
+
+    return build_plugin_tree(plugins, downcast_plugin_instances(plugins))
 
-    # restructure data
+
+def build_plugin_tree(plugins, instances):
+    """
+    Returns the plugin tree of the given path ordered plugins, instances are the downcasted plugins by pk, see
+    downcast_plugin_instances.
+    """
+    from cmsplus.plugin_base import PlusPluginBase
+
+    # restructure data, plugins are ordered by path: parents come before their children
+    plugin_tree = []
+    plugins_by_id = {}
+    root_positions = {}
     for plugin in plugins:
-        instance, p = plugin.get_plugin_instance()
+        instance = instances.get(plugin.pk)
+        plugin_class = plugin.get_plugin_class()
 
         plugin_data = {
             'id': plugin.id,
@@ -227,47 +1089,314 @@ def generate_plugin_tree(placeholder, language=None):
         }
 
         # handle PlusPlugins
-
-        from cmsplus.plugin_base import PlusPluginBase
-        if issubclass(p.__class__, PlusPluginBase):
+        if issubclass(plugin_class, PlusPluginBase):
             plugin_data['data'] = instance._json
             plugin_data['is_plusplugin'] = True
 
         # handle django cms plugins
         else:
-            plugin_fields = p.form.base_fields
+            plugin_fields = plugin_class.form.base_fields
             data = {}
             for field in plugin_fields:
                 if hasattr(instance, field):
                     data[field] = getattr(instance, field)
             plugin_data['data'] = data
 
-        _plugins.append(plugin_data)
+        # generate plugin tree (set children), plugins with a missing parent are skipped
+        plugins_by_id[plugin.id] = plugin_data
+        if not plugin.parent_id:
+            plugin_tree.append(plugin_data)
+            root_positions[plugin.id] = plugin.position
+        elif plugin.parent_id in plugins_by_id:
+            plugins_by_id[plugin.parent_id]['children'].append(plugin_data)
 
-    # generate plugin tree (set children)
-    _plugins = sorted(_plugins, key=lambda k: k['depth'], reverse=True)
-    plugin_tree = []
-    for current_plugin in _plugins:
-        if not current_plugin.get('parent_id'):
-            plugin_tree.append(current_plugin)
+    # the root plugins are rendered in position order, their paths may be in another order, see sync_plugins
+    plugin_tree.sort(key=lambda plugin_data: root_positions[plugin_data['id']] or 0)
+    return plugin_tree
+
+
+PAGE_FIELDS = {
+    'template': 'template',
+    'apphook': 'application_urls',
+    'apphook_namespace': 'application_namespace',
+    'in_navigation': 'in_navigation',
+    'soft_root': 'soft_root',
+    'reverse_id': 'reverse_id',
+    'login_required': 'login_required',
+    'navigation_extenders': 'navigation_extenders',
+}
+
+TITLE_FIELDS = ('title', 'menu_title', 'slug', 'redirect', 'meta_description', 'page_title')
+
+
+def get_page_by_path(path):
+    title = Title.objects.filter(path=path, publisher_is_draft=True).select_related('page__node').first()
+    return title.page if title else None
+
+
+def find_page(page_data, parent=None):
+    """
+    Returns the existing draft page matching the page data: by reverse_id or else by the slug below parent.
+    """
+    pages = Page.objects.drafts().select_related('node')
+    if page_data.get('reverse_id'):
+        return pages.filter(reverse_id=page_data['reverse_id']).first()
+    if parent:
+        pages = pages.filter(node__parent=parent.node)
+    else:
+        pages = pages.filter(node__parent__isnull=True)
+    return pages.filter(title_set__language=page_data['languages'][0], title_set__slug=page_data.get('slug')).first()
+
+
+def bulk_create_titles(page, titles):
+    """
+    Creates the titles {language: title values} of page with one query and updates the page languages once,
+    the titles match the ones of cms.api.create_title.
+    """
+    from cms.constants import PUBLISHER_STATE_DIRTY
+    from cms.utils.page import get_available_slug
+    from django.utils.text import slugify
+
+    objs = []
+    for language, values in titles.items():
+        slug = values.get('slug')
+        if not slug:
+            base = page.get_path_for_slug(slugify(values['title']), language)
+            slug = get_available_slug(page.node.site, base, language)
+        overwrite_url = values.get('overwrite_url')
+        if overwrite_url:
+            path = overwrite_url.strip('/')
+        else:
+            path = values.get('path') or page.get_path_for_slug(slug, language)
+
+        objs.append(Title(
+            language=language,
+            title=values['title'],
+            menu_title=values.get('menu_title'),
+            page_title=values.get('page_title'),
+            slug=slug,
+            path=path,
+            redirect=values.get('redirect'),
+            meta_description=values.get('meta_description'),
+            page=page,
+            has_url_overwrite=bool(overwrite_url),
+            # new titles are dirty, see Title.save_base
+            publisher_state=PUBLISHER_STATE_DIRTY,
+        ))
+    Title.objects.bulk_create(objs)
+
+    page_languages = page.get_languages()
+    new_languages = [language for language in titles if language not in page_languages]
+    if new_languages:
+        page.update_languages(page_languages + new_languages)
+    return objs
+
+
+def get_title_value(title, field):
+    # exports hold the menu and page titles with their fallback to the title, see PageUtils.process_page
+    value = getattr(title, field)
+    if field in ('menu_title', 'page_title'):
+        return value or title.title
+    return value
+
+
+def update_page(page, page_data, languages, additional_languages):
+    """
+    Updates the changed page fields and titles of an existing page, returns True if anything changed.
+    """
+    changed_fields = [field for key, field in PAGE_FIELDS.items()
+                      if key in page_data and getattr(page, field) != page_data[key]]
+    for key, field in PAGE_FIELDS.items():
+        if field in changed_fields:
+            setattr(page, field, page_data[key])
+    if changed_fields:
+        page.save(update_fields=changed_fields)
+        if 'template' in changed_fields:
+            page.rescan_placeholders()
+
+    titles = {title.language: title for title in Title.objects.filter(page=page)}
+    new_titles = {}
+    changed_titles = False
+    for lang, values in [(languages[0], page_data)] + list(additional_languages.items()):
+        title = titles.get(lang)
+        if title is None:
+            new_titles[lang] = {k: v for k, v in values.items() if k in TITLE_FIELDS}
+            continue
+
+        changed = [field for field in TITLE_FIELDS
+                   if field in values and get_title_value(title, field) != values[field]]
+        if not changed:
             continue
+        for field in changed:
+            setattr(title, field, values[field])
+        title.save(update_fields=changed)
+        changed_titles = True
+        if 'slug' in changed:
+            page._update_title_path(lang)
+            page._update_title_path_recursive(lang)
 
-        for plugin in _plugins:
-            if current_plugin.get('parent_id') == plugin.get('id'):
-                plugin['children'].append(current_plugin)
+    if new_titles:
+        bulk_create_titles(page, new_titles)
+        changed_titles = True
 
-    return plugin_tree
+    if changed_fields or changed_titles:
+        page.clear_cache(menu=True)
+    return bool(changed_fields or changed_titles)
+
+
+def sync_plugins(placeholder, plugin_tree):
+    """
+    Writes only the changed root plugin subtrees of the placeholder: the current and the new root subtrees are
+    matched by content hash wherever they are, matched subtrees are kept, the unmatched current ones are deleted and
+    the unmatched new ones are created. Afterwards the root positions are renumbered in the order of plugin_tree.
+    Returns the number of written root plugins.
+    """
+    current = generate_plugin_tree(placeholder)
+    current_ids = defaultdict(list)
+    for plugin_data in current:
+        current_ids[get_content_hash(normalize_plugin_tree(plugin_data))].append(plugin_data['id'])
 
+    # the kept plugin id per new root subtree, None for the new ones
+    kept_ids = []
+    for plugin_data in plugin_tree:
+        ids = current_ids.get(get_content_hash(normalize_plugin_tree(plugin_data)))
+        kept_ids.append(ids.pop(0) if ids else None)
+    removed_ids = [pk for ids in current_ids.values() for pk in ids]
+    if not removed_ids and kept_ids == [plugin_data['id'] for plugin_data in current]:
+        return 0
+
+    if removed_ids:
+        removed = CMSPlugin.objects.filter(placeholder=placeholder, pk__in=removed_ids)
+        query = Q()
+        for path in removed.values_list('path', flat=True):
+            query |= Q(path__startswith=path)
+        CMSPlugin.objects.filter(query, placeholder=placeholder).delete()
+
+    # new root plugins get paths after all existing ones
+    new_roots = [plugin_data for plugin_data, pk in zip(plugin_tree, kept_ids) if pk is None]
+    BulkPluginImporter(placeholder).import_plugins(new_roots)
+
+    roots = CMSPlugin.objects.filter(placeholder=placeholder, parent__isnull=True).order_by('path')
+    positions = {pk: (language, position) for pk, language, position in roots.values_list('pk', 'language', 'position')}
+    new_ids = iter([pk for pk in positions if pk not in kept_ids])
+    changed = []
+    language_positions = defaultdict(int)
+    for pk in kept_ids:
+        pk = pk or next(new_ids)
+        language, position = positions[pk]
+        if position != language_positions[language]:
+            changed.append(CMSPlugin(pk=pk, position=language_positions[language]))
+        language_positions[language] += 1
+    CMSPlugin.objects.bulk_update(changed, ['position'])
+    return len(new_roots)
+
+
+_import_contexts = threading.local()
+
+
+def rescan_placeholders(page):
+    """
+    Replaces Page.rescan_placeholders (called by cms.api.create_page) while an ImportContext is active.
+    """
+    context = getattr(_import_contexts, 'context', None)
+    if context is None:
+        return page._cmsplus_rescan_placeholders()
+    return context.rescan_placeholders(page)
+
+
+class ImportContext:
+    """
+    Caches the template placeholder declarations and the slot -> placeholder maps of the imported pages. New pages
+    get all their placeholders created in bulk. Use it as context manager around the import (per thread).
+    """
+
+    def __init__(self):
+        self.template_slots = {}
+        self.node_templates = {}
+        self.page_placeholders = {}
+        self.new_page = False
+        # pks of the created or updated pages
+        self.imported_pages = []
+
+    def __enter__(self):
+        if not hasattr(Page, '_cmsplus_rescan_placeholders'):
+            Page._cmsplus_rescan_placeholders = Page.rescan_placeholders
+            Page.rescan_placeholders = rescan_placeholders
+        self._outer = getattr(_import_contexts, 'context', None)
+        _import_contexts.context = self
+        return self
+
+    def __exit__(self, *exc_info):
+        _import_contexts.context = self._outer
+
+    def get_template(self, page):
+        """
+        Returns the template of page, inherited templates are looked up from the already imported parents.
+        """
+        template = page.template
+        if template == TEMPLATE_INHERITANCE_MAGIC:
+            template = self.node_templates.get(page.node.parent_id) or page.get_template()
+        self.node_templates[page.node_id] = template
+        return template
+
+    def get_template_slots(self, template):
+        if template not in self.template_slots:
+            from cms.utils.placeholder import get_placeholders
+
+            self.template_slots[template] = [placeholder.slot for placeholder in get_placeholders(template)]
+        return self.template_slots[template]
+
+    def rescan_placeholders(self, page):
+        slots = self.get_template_slots(self.get_template(page))
+        # a just created page has no placeholders yet
+        existing = {} if self.new_page else {p.slot: p for p in page.placeholders.all()}
+
+        missing = [Placeholder(slot=slot) for slot in slots if slot not in existing]
+        if missing:
+            if connections[Placeholder.objects.db].features.can_return_rows_from_bulk_insert:
+                Placeholder.objects.bulk_create(missing)
+            else:
+                for placeholder in missing:
+                    placeholder.save()
+            page.placeholders.add(*missing)
+
+        placeholders = {**existing, **{p.slot: p for p in missing}}
+        self.page_placeholders[page.pk] = placeholders
+        return placeholders
+
+    def get_placeholders(self, page):
+        """
+        Returns the slot -> placeholder map of page.
+        """
+        if page.pk not in self.page_placeholders:
+            self.page_placeholders[page.pk] = {p.slot: p for p in page.placeholders.all()}
+        return self.page_placeholders[page.pk]
+
+
+def generate_structure(structure: List[dict], parent: object = None, force: object = False, skip_plugins=None,
+                       upsert=False, context=None):
+    """
+    Creates the pages of the structure. With upsert, existing pages (see find_page) are updated instead: only
+    changed page fields, titles and plugin subtrees are written. Pages with a 'parent_path' (delta exports) are
+    created below the page with that path. Existing pages missing from the structure are kept, upsert neither
+    deletes nor moves pages. context is the ImportContext shared by the whole import. Returns the created or updated
+    pages of the structure (without their children).
+    """
+    if context is None:
+        with ImportContext() as context:
+            return generate_structure(structure, parent=parent, force=force, skip_plugins=skip_plugins,
+                                      upsert=upsert, context=context)
 
-def generate_structure(structure: List[dict], parent: object = None, force: object = False, skip_plugins=None):
-    _structure = copy.deepcopy(structure)
     if not parent:
         logger.debug('\n--- Root Level ---')
     else:
         logger.debug(f'\n--- Parent: {parent} ---')
     logger.debug(f'Found {len(structure)} pages')
 
-    for page in _structure:
+    pages = []
+    for page in structure:
+        # the popped keys must not change the structure, it is not copied as a whole
+        page = dict(page)
         languages = page.pop('languages')
         plugins = page.pop('plugins')
         is_home = page.pop('is_home', False)
@@ -280,53 +1409,76 @@ def generate_structure(structure: List[dict], parent: object = None, force: obje
         children = page.pop('children')
         logger.debug(f'Page has {len(children)} sub pages')
 
-        if parent:
-            page['parent'] = parent
-
-        rid = page.get('reverse_id')
-        if force and rid:
-            logger.info(f'Forced creating Page with {rid}')
-            Page.objects.filter(reverse_id=rid).delete()
-
-        try:
-            p = create_page(
-                language=languages[0],
-                **page
-            )
-        except FieldError as e:
-            logger.error(e)
-            continue
+        page_parent = parent
+        if 'parent_path' in page:
+            parent_path = page.pop('parent_path')
+            if parent_path is not None:
+                page_parent = get_page_by_path(parent_path)
+                if page_parent is None:
+                    logger.error(f'Parent page with path "{parent_path}" does not exist')
+                    continue
+
+        if page_parent:
+            page['parent'] = page_parent
+
+        p = None
+        if upsert:
+            p = find_page({'languages': languages, **page}, page_parent)
+            if p and update_page(p, page, languages, additional_languages):
+                logger.info(f'Updated Page "{title}"')
+
+        if p is None:
+            rid = page.get('reverse_id')
+            if force and rid and not upsert:
+                logger.info(f'Forced creating Page with {rid}')
+                Page.objects.filter(reverse_id=rid).delete()
+
+            context.new_page = True
+            try:
+                p = create_page(
+                    language=languages[0],
+                    **page
+                )
+            except FieldError as e:
+                logger.error(e)
+                continue
+            finally:
+                context.new_page = False
+
+            # create additional titles (multi lang)
+            if additional_languages:
+                bulk_create_titles(p, additional_languages)
 
         # set home
         if is_home:
             p.is_home = True
-
-        # create additional titles (multi lang)
-        for lang, value in additional_languages.items():
-            create_title(
-                language=lang,
-                page=p,
-                **value,
-            )
+        context.imported_pages.append(p.pk)
+        pages.append(p)
 
         # generate plugins for page
         if not skip_plugins:
+            placeholders = context.get_placeholders(p)
             for placeholder_slot, data in plugins.items():
-                try:
-                    placeholder = p.placeholders.get(slot=placeholder_slot)
-                except Placeholder.DoesNotExist:
+                placeholder = placeholders.get(placeholder_slot)
+                if placeholder is None:
                     logger.error(f'Placeholder slot "{placeholder_slot}" does not exist')
                     continue
 
-                for plugin_data in data:
-                    plus_add_plugin(
-                        placeholder=placeholder,
-                        plugin_data=plugin_data
-                    )
+                if upsert:
+                    sync_plugins(placeholder, data)
+                else:
+                    BulkPluginImporter(placeholder).import_plugins(data)
+
+            if upsert:
+                # placeholders without plugins are not exported
+                for slot, placeholder in placeholders.items():
+                    if slot not in plugins:
+                        sync_plugins(placeholder, [])
 
         # create plugins
         if children:
-            generate_structure(children, parent=p, force=force)
+            generate_structure(children, parent=p, force=force, upsert=upsert, context=context)
+    return pages
 
 
 class HtmlTagStripper(HTMLParser):
@@ -1,8 +1,13 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import json
+
+from django import forms
+from django.conf import settings
 from django.forms import Widget
 from django.forms.utils import flatatt
+from django.urls import reverse
 from django.utils.html import escape, mark_safe, strip_spaces_between_tags
 from django.utils.translation import ugettext as _
 
@@ -202,3 +207,77 @@ class KeyValueWidget(Widget):
 
     def value_omitted_from_data(self, data, files, name):
         return False
+
+
+class FilerSearchWidget(forms.Select):
+    """
+    A select2 autocomplete widget for filer file and image fields. Choices are loaded page by page from the
+    filer search endpoint (see CustomPageAdmin.filer_search), only the selected file is rendered as option.
+    """
+    url_name = 'admin:filer-search'
+
+    def __init__(self, search_type='file', attrs=None):
+        """
+        :param search_type: (str) 'file' or 'image', restricts the search endpoint to the given filer model
+        """
+        self.search_type = search_type
+        super().__init__(attrs)
+
+    def get_url(self):
+        return '%s?type=%s' % (reverse(self.url_name), self.search_type)
+
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        """
+        Set select2's AJAX attributes, which are picked up by django admins autocomplete.js.
+        """
+        attrs = super().build_attrs(base_attrs, extra_attrs=extra_attrs)
+        attrs.setdefault('class', '')
+        attrs.update({
+            'data-ajax--cache': 'true',
+            'data-ajax--delay': 250,
+            'data-ajax--type': 'GET',
+            'data-ajax--url': self.get_url(),
+            'data-theme': 'admin-autocomplete',
+            'data-allow-clear': json.dumps(not self.is_required),
+            'data-placeholder': '',  # Allows clearing of the input.
+            'class': attrs['class'] + (' ' if attrs['class'] else '') + 'admin-autocomplete',
+        })
+        return attrs
+
+    def optgroups(self, name, value, attrs=None):
+        """
+        Return the selected option only, the choices queryset is never iterated.
+        """
+        default = (None, [], 0)
+        selected_choices = [str(v) for v in value if str(v) not in self.choices.field.empty_values]
+        if not self.is_required:
+            default[1].append(self.create_option(name, '', '', False, 0))
+        if selected_choices:
+            field = self.choices.field
+            # the label contains the folder name
+            queryset = field.queryset
+            if hasattr(queryset, 'non_polymorphic'):
+                queryset = queryset.non_polymorphic()
+            for obj in queryset.select_related('folder').filter(pk__in=selected_choices):
+                index = len(default[1])
+                default[1].append(self.create_option(
+                    name, str(obj.pk), field.label_from_instance(obj), True, index))
+        return [default]
+
+    @property
+    def media(self):
+        extra = '' if settings.DEBUG else '.min'
+        return forms.Media(
+            js=(
+                'admin/js/vendor/jquery/jquery%s.js' % extra,
+                'admin/js/vendor/select2/select2.full%s.js' % extra,
+                'admin/js/jquery.init.js',
+                'admin/js/autocomplete.js',
+            ),
+            css={
+                'screen': (
+                    'admin/css/vendor/select2/select2%s.css' % extra,
+                    'admin/css/autocomplete.css',
+                ),
+            },
+        )
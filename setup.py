@@ -64,6 +64,8 @@ setup(
     tests_require=TESTS_REQUIRE,
     extras_require={
         'cmsplus_tests': TESTS_REQUIRE,
+        'msgpack': ['msgpack'],
+        'zstd': ['zstandard'],
     },
     cmdclass={'cmsplus_tests': Tox}
 )